@@ -1,7 +1,10 @@
+import argparse
 import zmq
 import math
 import time
 from datetime import datetime
+from telemetry import ALTITUDE_UNITS, BUS_LAYOUT, TelemetrySchema, FramePublisher
+from approach_geometry import RunwayIndex, load_runways
 
 # Initialize ZMQ publisher
 context = zmq.Context()
@@ -9,40 +12,32 @@ socket = context.socket(zmq.PUB)
 socket.bind("tcp://*:1137")
 
 # Constants
-GLIDE_SLOPE_ANGLE = 3  # degrees
-RUNWAY_TRUE_HEADING = 60  # degrees
+DEFAULT_RUNWAY = "Risalpur 60R"  # runways.csv entry flown by default
 START_DISTANCE = 15000  # 15km in meters
 APPROACH_SPEED = 70  # m/s (about 136 knots)
 UPDATE_RATE = 1  # seconds between updates
 
-# Base coordinates for Risalpur
-BASE_LAT = 34.07079
-BASE_LON = 71.976469
-START_ALT = START_DISTANCE * math.tan(math.radians(GLIDE_SLOPE_ANGLE)) -200   # meters + 25m buffer
-
-def calculate_position(distance_from_threshold):
-    """Calculate lat/lon/alt for a given distance along perfect glide slope"""
-    # Calculate altitude on glide slope
-    altitude = distance_from_threshold * math.tan(math.radians(GLIDE_SLOPE_ANGLE)) - 400
-    
-    # Convert distance to lat/lon change - modified to keep aircraft on centerline
-    heading_rad = math.radians(RUNWAY_TRUE_HEADING)
-    
-    # Only move along x-axis relative to runway heading
-    dx = -distance_from_threshold * math.cos(heading_rad)
-    dy = 0  # Set to 0 to keep aircraft on centerline
-    
-    # Convert to lat/lon (approximate conversion)
-    delta_lon = dx / 111320 / math.cos(math.radians(BASE_LAT))  # longitude correction for latitude
-    delta_lat = dy / 110540  # Will be 0 since dy is 0
+def calculate_position(runway, distance_from_threshold, offset=0.0):
+    """Calculate lat/lon/alt for a given distance along perfect glide slope,
+    `offset` metres below it. The altitude is metres above mean sea level."""
+    # Height above the threshold on the glide slope
+    height = distance_from_threshold * math.tan(math.radians(runway.glide_slope)) - offset
     
-    lon = BASE_LON + delta_lon
-    lat = BASE_LAT + delta_lat
-    
-    return lat, lon, altitude
+    # On the extended centerline, before the threshold in the runway frame
+    lat, lon, altitude = runway.to_geodetic(-distance_from_threshold, 0, height)
 
-def create_message(lat, lon, alt, ground_track):
-    """Create properly formatted message string"""
+    return float(lat), float(lon), float(altitude)
+
+# Binary frame layout of the message built by create_fields
+MESSAGE_SCHEMA = TelemetrySchema(
+    ["timestamp", "identity", "mode", "phase", "latitude", "longitude", "altitude", "speed",
+     "ground_track"] + [f"field_{i}" for i in range(9, 17)] + ["heading"],
+    ["<U14", "<U16", "<U16", "<U16"] + ["<f8"] * 14
+)
+
+
+def create_fields(lat, lon, alt, ground_track):
+    """Create the message fields in bus order"""
     # Create dummy values for unused fields
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     msg_parts = [
@@ -63,23 +58,42 @@ def create_message(lat, lon, alt, ground_track):
         "0",               # field 14
         "0",               # field 15
         "0",               # field 16
-        f"{RUNWAY_TRUE_HEADING:.1f}"  # field 17 - magnetic heading
+        f"{ground_track:.1f}"  # field 17 - magnetic heading, along the track
     ]
-    return "|".join(msg_parts)
+    return msg_parts
+
+
+def create_message(lat, lon, alt, ground_track):
+    """Create properly formatted message string"""
+    return "|".join(create_fields(lat, lon, alt, ground_track))
 
 def main():
-    print("Starting perfect approach data publisher...")
+    parser = argparse.ArgumentParser(description="Publish a perfect glide path approach")
+    parser.add_argument("--binary", action="store_true",
+                        help="publish binary telemetry frames instead of pipe-delimited text")
+    parser.add_argument("--runway", default=DEFAULT_RUNWAY,
+                        help="runway to approach, as '<Airfield> <Runway>' in runways.csv")
+    parser.add_argument("--offset", type=float, default=0.0,
+                        help="metres to fly below the glide slope (the original publisher flew 400 m low)")
+    parser.add_argument("--altitude-unit", choices=sorted(ALTITUDE_UNITS), default=BUS_LAYOUT.altitude_unit,
+                        help="unit to publish the altitude in")
+    args = parser.parse_args()
+    metres_per_unit = ALTITUDE_UNITS[args.altitude_unit]
+    runway = RunwayIndex(load_runways()).find(args.runway)
+    publisher = FramePublisher(socket, MESSAGE_SCHEMA, binary=args.binary)
+
+    print(f"Starting perfect approach data publisher for {runway.name}...")
     current_distance = START_DISTANCE
     
     try:
         while current_distance > 0:
             # Calculate current position
-            lat, lon, alt = calculate_position(current_distance)
+            lat, lon, alt = calculate_position(runway, current_distance, args.offset)
             
             # Create and send message
-            msg = create_message(lat, lon, alt, RUNWAY_TRUE_HEADING)
-            socket.send_string(msg)
-            print(f"Published position: distance={current_distance:.1f}m, altitude={alt:.1f}m")
+            publisher.send_values(create_fields(lat, lon, alt / metres_per_unit, runway.heading))
+            print(f"Published position: distance={current_distance:.1f}m, "
+                  f"altitude={alt / metres_per_unit:.1f}{args.altitude_unit} MSL")
             
             # Move aircraft forward
             current_distance -= APPROACH_SPEED * UPDATE_RATE
@@ -88,8 +102,8 @@ def main():
             time.sleep(UPDATE_RATE)
             
         # Send final position at threshold
-        msg = create_message(BASE_LAT, BASE_LON, 0, RUNWAY_TRUE_HEADING)
-        socket.send_string(msg)
+        publisher.send_values(create_fields(runway.lat, runway.lon, runway.elevation / metres_per_unit,
+                                            runway.heading))
         print("Aircraft reached runway threshold")
         
     except KeyboardInterrupt:
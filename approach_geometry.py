@@ -0,0 +1,142 @@
+import csv
+import math
+import os
+import numpy as np
+
+# Runway registry shipped next to these scripts; one row per runway end
+RUNWAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runways.csv")
+
+
+class RunwayFrame:
+    """Local frame of one runway, precomputed once.
+
+    Coordinates are metres from the threshold: `along` the runway heading
+    (negative on the approach), `left` of the centreline and `up` above
+    the threshold elevation, a right-handed frame. Positions are projected
+    on the tangent plane at the threshold with the WGS84 metres-per-degree
+    at its latitude, which is accurate to well under a metre over an
+    approach. All transforms take scalars or NumPy arrays, so whole trails
+    and many aircraft convert in one call.
+    """
+
+    def __init__(self, lat, lon, heading, elevation=0.0, glide_slope=3.0, name=""):
+        self.lat = lat
+        self.lon = lon
+        self.heading = heading
+        self.elevation = elevation
+        self.glide_slope = glide_slope
+        self.name = name
+
+        # Metres per degree of latitude and longitude at the threshold
+        phi = math.radians(lat)
+        self.metres_per_lat = (111132.92 - 559.82 * math.cos(2 * phi) +
+                               1.175 * math.cos(4 * phi) - 0.0023 * math.cos(6 * phi))
+        self.metres_per_lon = (111412.84 * math.cos(phi) - 93.5 * math.cos(3 * phi) +
+                               0.118 * math.cos(5 * phi))
+
+        # Runway direction (east, north components) for the rotation
+        theta = math.radians(heading)
+        self.sin_heading = math.sin(theta)
+        self.cos_heading = math.cos(theta)
+
+    def to_local(self, lat, lon, alt):
+        """Geodetic position (degrees, metres) to (along, left, up) in metres"""
+        east = (np.asarray(lon, dtype=float) - self.lon) * self.metres_per_lon
+        north = (np.asarray(lat, dtype=float) - self.lat) * self.metres_per_lat
+        along = east * self.sin_heading + north * self.cos_heading
+        left = north * self.sin_heading - east * self.cos_heading
+        up = np.asarray(alt, dtype=float) - self.elevation
+        return along, left, up
+
+    def to_geodetic(self, along, left, up):
+        """Inverse of to_local: (along, left, up) in metres to (lat, lon, alt)"""
+        along = np.asarray(along, dtype=float)
+        left = np.asarray(left, dtype=float)
+        east = along * self.sin_heading - left * self.cos_heading
+        north = along * self.cos_heading + left * self.sin_heading
+        lat = self.lat + north / self.metres_per_lat
+        lon = self.lon + east / self.metres_per_lon
+        return lat, lon, np.asarray(up, dtype=float) + self.elevation
+
+    def deviations(self, along, left, up):
+        """Localizer and glide slope deviations in degrees, seen from the
+        threshold: positive when left of the centreline and above the slope"""
+        distance = -np.asarray(along, dtype=float)
+        localizer = np.degrees(np.arctan2(left, distance))
+        glide_slope = np.degrees(np.arctan2(up, distance)) - self.glide_slope
+        return localizer, glide_slope
+
+
+# Load every runway end in a registry CSV as a RunwayFrame named
+# "<Airfield> <Runway>"
+def load_runways(path=RUNWAYS_FILE):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [RunwayFrame(float(row["Latitude"]), float(row["Longitude"]), float(row["True_Heading"]),
+                            elevation=float(row["Elevation"] or 0), glide_slope=float(row["Glide_Slope"] or 3),
+                            name=f"{row['Airfield']} {row['Runway']}")
+                for row in csv.DictReader(f)]
+
+
+class RunwayIndex:
+    """Grid index over runway thresholds for matching positions to approaches.
+
+    Cells are at least `capture_range` metres across, so every threshold
+    within range of a position is in its own cell or one of the eight
+    around it, and a match costs the same however many runways are
+    registered. A position is on a runway's approach when it is before the
+    threshold, within `capture_range` of it and within `sector` degrees of
+    the extended centreline; the nearest such runway wins.
+    """
+
+    def __init__(self, runways, capture_range=30000.0, sector=35.0):
+        self.runways = list(runways)
+        self.capture_range = capture_range
+        self.sector = sector
+        # 110574 m is the shortest degree of latitude, at the equator
+        self.cell_lat = capture_range / 110574.0
+        self.cells = {}
+        for runway in self.runways:
+            self.cells.setdefault(self._cell(runway.lat, runway.lon), []).append(runway)
+
+    def _row(self, lat):
+        return math.floor(lat / self.cell_lat)
+
+    def _cell_lon(self, row):
+        # Longitude width of the cells in a latitude band, wide enough at
+        # the band's poleward edge
+        edge = max(abs(row * self.cell_lat), abs((row + 1) * self.cell_lat))
+        return min(self.cell_lat / max(math.cos(math.radians(min(edge, 90.0))), 1e-6), 360.0)
+
+    def _cell(self, lat, lon):
+        row = self._row(lat)
+        return row, math.floor(lon / self._cell_lon(row))
+
+    def candidates(self, lat, lon):
+        """Runways whose threshold may be within capture range of a position"""
+        row = self._row(lat)
+        for r in (row - 1, row, row + 1):
+            column = math.floor(lon / self._cell_lon(r))
+            for c in (column - 1, column, column + 1):
+                yield from self.cells.get((r, c), ())
+
+    def match(self, lat, lon, alt):
+        """Return the runway whose approach the position is on and the
+        position in its frame, or (None, None) when it is on none"""
+        best = None
+        for runway in self.candidates(lat, lon):
+            along, left, up = runway.to_local(lat, lon, alt)
+            distance = math.hypot(along, left)
+            if along >= 0 or distance > self.capture_range:
+                continue
+            if abs(math.degrees(math.atan2(left, -along))) > self.sector:
+                continue
+            if best is None or distance < best[0]:
+                best = (distance, runway, (along, left, up))
+        return (best[1], best[2]) if best else (None, None)
+
+    def find(self, name):
+        """Runway by its "<Airfield> <Runway>" name"""
+        for runway in self.runways:
+            if runway.name == name:
+                return runway
+        raise KeyError(f"No runway named {name!r} in the registry")
@@ -0,0 +1,221 @@
+import argparse
+import math
+from collections import deque
+from datetime import datetime
+from time import time
+import zmq
+from telemetry import ALTITUDE_UNITS, BUS_LAYOUT, FieldDecoder, FramePublisher, StreamLayout, TelemetrySchema
+from approach_geometry import RunwayIndex, load_runways
+from rule_engine import AIRCRAFT_FIELDS, receive_batch
+
+# Result message layout. Consumers decode it by name with APPROACH_LAYOUT,
+# e.g. FieldDecoder(fields, layout=APPROACH_LAYOUT) or rule_engine.py
+# --stream approach; it is not the layout of the telemetry bus. Distances
+# and heights are metres, deviations degrees (positive left of the
+# centreline and above the glide slope), descent rate metres per second and
+# unstable 1 when the approach is below the gate and not stabilized.
+APPROACH_FIELDS = ['timestamp', 'identity', 'mode', 'phase', 'runway', 'distance', 'height',
+                   'loc_deviation', 'gs_deviation', 'descent_rate', 'unstable']
+APPROACH_SCHEMA = TelemetrySchema(APPROACH_FIELDS, ["<U14", "<U16", "<U16", "<U16", "<U32"] + ["<f8"] * 6)
+APPROACH_LAYOUT = StreamLayout({field: i for i, field in enumerate(APPROACH_FIELDS)},
+                               ['timestamp', 'identity', 'mode', 'phase', 'runway'])
+
+# Bus fields read for every message
+INPUT_FIELDS = AIRCRAFT_FIELDS + ['timestamp', 'latitude', 'longitude', 'altitude']
+
+
+class ApproachWindow:
+    """The last `seconds` of one aircraft's approach.
+
+    Running sums over the window give the least-squares descent rate and
+    the number of samples outside the deviation limits, so each sample
+    costs O(1) however fast the bus.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        self._reset(None)
+
+    def _reset(self, origin):
+        # Times are kept relative to an origin for precision in the sums
+        self.origin = origin
+        self.n = 0
+        self.sum_t = self.sum_h = self.sum_tt = self.sum_th = 0.0
+        self.exceeded = 0
+
+    def _count(self, t, height, exceeded, sign):
+        self.n += sign
+        self.sum_t += sign * t
+        self.sum_h += sign * height
+        self.sum_tt += sign * t * t
+        self.sum_th += sign * t * height
+        self.exceeded += sign * exceeded
+
+    def add(self, timestamp, height, exceeded):
+        if self.origin is None:
+            self._reset(timestamp)
+        t = timestamp - self.origin
+        self.samples.append((t, height, exceeded))
+        self._count(t, height, exceeded, 1)
+        while self.samples[0][0] < t - self.seconds:
+            self._count(*self.samples.popleft(), -1)
+
+    def descent_rate(self):
+        """Metres per second lost over the window, NaN until it spans some time"""
+        spread = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if self.n < 2 or spread <= 1e-9 * max(self.n * self.sum_tt, 1.0):
+            return math.nan
+        return -(self.n * self.sum_th - self.sum_t * self.sum_h) / spread
+
+
+class ApproachMonitor:
+    """Stabilized-approach assessment of every aircraft on the bus.
+
+    Each position is matched to the approach it is on, its deviations are
+    computed in that runway's frame, and below `gate` metres the approach
+    is unstable if any sample in the window was outside the localizer or
+    glide slope limits or the descent rate is above `descent_limit`.
+    Bus altitudes are multiplied by `metres_per_altitude` first.
+    """
+
+    def __init__(self, runways, window=5.0, gate=304.8, loc_limit=1.0, gs_limit=0.7,
+                 descent_limit=5.08, timeout=60.0, metres_per_altitude=1.0):
+        self.runways = runways
+        self.metres_per_altitude = metres_per_altitude
+        self.window = window
+        self.gate = gate
+        self.loc_limit = loc_limit
+        self.gs_limit = gs_limit
+        self.descent_limit = descent_limit
+        self.timeout = timeout
+        self.aircraft = {}  # identity -> [runway, ApproachWindow, last seen]
+        self._time_text = None
+        self._time_value = None
+
+    def message_time(self, timestamp, received):
+        """Unix time of a bus timestamp (YYYYmmddHHMMSS), or the arrival time
+        when it does not parse; consecutive messages mostly share one"""
+        if timestamp != self._time_text:
+            try:
+                self._time_value = datetime.strptime(timestamp, "%Y%m%d%H%M%S").timestamp()
+            except (TypeError, ValueError):
+                self._time_value = None
+            self._time_text = timestamp
+        return self._time_value if self._time_value is not None else received
+
+    def update(self, row, received):
+        """Assess one decoded INPUT_FIELDS row; returns an APPROACH_FIELDS
+        tuple, or None when the aircraft is not on any approach"""
+        identity, mode, phase, timestamp, lat, lon, alt = row
+        runway, local = self.runways.match(lat, lon, alt * self.metres_per_altitude)
+        if runway is None:
+            return None
+        along, left, up = local
+        loc, gs = runway.deviations(along, left, up)
+        loc, gs = float(loc), float(gs)
+
+        key = "/".join((identity, mode, phase))
+        state = self.aircraft.get(key)
+        if state is None or state[0] is not runway:
+            state = self.aircraft[key] = [runway, ApproachWindow(self.window), received]
+        state[2] = received
+        window = state[1]
+        window.add(self.message_time(timestamp, received), float(up),
+                   abs(loc) > self.loc_limit or abs(gs) > self.gs_limit)
+
+        descent_rate = window.descent_rate()
+        unstable = up < self.gate and (window.exceeded > 0 or descent_rate > self.descent_limit)
+        return (timestamp, identity, mode, phase, runway.name, float(-along), float(up),
+                loc, gs, descent_rate, float(unstable))
+
+    def expire(self, now):
+        """Forget aircraft not seen for `timeout` seconds"""
+        for key in [key for key, state in self.aircraft.items() if now - state[2] > self.timeout]:
+            del self.aircraft[key]
+
+
+# Assess every message on the bus and publish the results, one binary frame
+# (or text message per row) for each received batch
+def monitor_approaches(zmq_port, out_port, monitor, binary=True, batch_size=1000, batch_window=0.02,
+                       report_interval=10.0, layout=BUS_LAYOUT):
+    decoder = FieldDecoder(INPUT_FIELDS, layout=layout)
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.connect(zmq_port)
+    socket.setsockopt_string(zmq.SUBSCRIBE, '')  # Subscribe to all messages
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+
+    pub_socket = context.socket(zmq.PUB)
+    pub_socket.bind(out_port)
+    publisher = FramePublisher(pub_socket, APPROACH_SCHEMA, binary=binary)
+
+    print(f"Monitoring approaches on {zmq_port}, publishing to {out_port}...")
+    last_report = time()
+    rows = published = rejected = 0
+    while True:
+        try:
+            messages, _ = receive_batch(socket, poller, batch_size, batch_window, idle_timeout=1000)
+            now = time()
+            results = []
+            for message in messages:
+                try:
+                    decoded = decoder.decode(message)
+                except (IndexError, ValueError):
+                    rejected += 1
+                    continue
+                rows += len(decoded)
+                for row in decoded:
+                    result = monitor.update(row, now)
+                    if result is not None:
+                        results.append(result)
+            if results:
+                publisher.send_records(APPROACH_SCHEMA.pack(results))
+                published += len(results)
+
+            if now - last_report >= report_interval:
+                monitor.expire(now)
+                print(f"Assessed {rows} rows ({rows / (now - last_report):.0f}/s), published {published}, "
+                      f"{len(monitor.aircraft)} aircraft on approach, {rejected} rejected messages")
+                last_report = now
+                rows = published = rejected = 0
+        except KeyboardInterrupt:
+            print("Stopping approach monitor.")
+            break
+        except Exception as e:
+            print(f"Error monitoring approaches: {e}")
+
+    socket.close()
+    pub_socket.close()
+    context.term()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assess approach stability for every message on the bus")
+    parser.add_argument("--port", default="tcp://localhost:1137")
+    parser.add_argument("--header", help="flight CSV whose header gives the field positions on the bus")
+    parser.add_argument("--altitude-unit", choices=sorted(ALTITUDE_UNITS), default=BUS_LAYOUT.altitude_unit,
+                        help="unit of the altitude field on the bus")
+    parser.add_argument("--out", default="tcp://*:5557", help="address to publish the results on")
+    parser.add_argument("--text", action="store_true",
+                        help="publish pipe-delimited text instead of binary frames")
+    parser.add_argument("--window", type=float, default=5.0, help="seconds of samples the verdict covers")
+    parser.add_argument("--gate", type=float, default=304.8,
+                        help="height above the threshold (m) below which approaches must be stabilized")
+    parser.add_argument("--loc-limit", type=float, default=1.0, help="maximum localizer deviation, degrees")
+    parser.add_argument("--gs-limit", type=float, default=0.7, help="maximum glide slope deviation, degrees")
+    parser.add_argument("--descent-limit", type=float, default=5.08,
+                        help="maximum descent rate, m/s (5.08 is 1000 ft/min)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="maximum messages per batch")
+    parser.add_argument("--batch-window", type=float, default=0.02,
+                        help="seconds to keep filling a batch after the first message")
+    args = parser.parse_args()
+
+    layout = StreamLayout.from_csv(args.header) if args.header else BUS_LAYOUT
+    layout = layout.with_altitude_unit(args.altitude_unit)
+    monitor = ApproachMonitor(RunwayIndex(load_runways()), args.window, args.gate,
+                              args.loc_limit, args.gs_limit, args.descent_limit,
+                              metres_per_altitude=layout.metres_per_altitude)
+    monitor_approaches(args.port, args.out, monitor, not args.text, args.batch_size, args.batch_window,
+                       layout=layout)
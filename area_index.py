@@ -0,0 +1,102 @@
+import argparse
+import os
+from time import perf_counter
+import numpy as np
+import shapefile
+import shapely
+from shapely.geometry import shape
+
+# FDA area polygons, one shapefile per area (area_1.shp ... area_21.shp),
+# in longitude/latitude like the bus positions
+AREA_DIRECTORY = r'D:\ad_tewa0.8_stable\FDA\fda area'
+AREA_COUNT = 21
+
+
+def area_paths(directory=AREA_DIRECTORY, count=AREA_COUNT):
+    return [os.path.join(directory, f"area_{number}.shp") for number in range(1, count + 1)]
+
+
+# Read the polygons of each shapefile, named after the file ("area_3")
+def load_areas(paths):
+    names = []
+    geometries = []
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with shapefile.Reader(path) as reader:
+            for area_shape in reader.shapes():
+                if area_shape.shapeType == shapefile.NULL:
+                    continue
+                names.append(name)
+                geometries.append(shape(area_shape.__geo_interface__))
+    return names, geometries
+
+
+class AreaIndex:
+    """Point-in-area queries over the FDA area polygons.
+
+    The polygons are prepared once and bulk-loaded into an STRtree, so a
+    query only tests the few polygons whose bounding boxes hold the point,
+    each with its prepared geometry; this takes microseconds per position.
+    Points on an area's boundary count as inside it.
+    """
+
+    def __init__(self, names, geometries):
+        self.names = list(names)
+        self.geometries = np.array(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def from_shapefiles(cls, paths=None):
+        return cls(*load_areas(area_paths() if paths is None else paths))
+
+    def areas_at(self, lat, lon):
+        """Names of the areas containing one position, in area order"""
+        hits = self.tree.query(shapely.Point(lon, lat), predicate='intersects')
+        return list(dict.fromkeys(self.names[i] for i in np.sort(hits)))
+
+    def areas_of(self, lats, lons):
+        """Names of the areas containing each of a batch of positions"""
+        points = shapely.points(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+        positions, hits = self.tree.query(points, predicate='intersects')
+        order = np.lexsort((hits, positions))
+        areas = [[] for _ in range(len(points))]
+        for position, hit in zip(positions[order].tolist(), hits[order].tolist()):
+            name = self.names[hit]
+            if name not in areas[position]:
+                areas[position].append(name)
+        return areas
+
+
+class AreaTracker:
+    """Areas each aircraft is in, reporting entries and exits as it moves"""
+
+    def __init__(self, index):
+        self.index = index
+        self.current = {}
+
+    def update(self, aircraft, lat, lon):
+        """Return the (entered, exited) area names since the last position"""
+        areas = self.index.areas_at(lat, lon)
+        previous = self.current.get(aircraft, [])
+        self.current[aircraft] = areas
+        return [area for area in areas if area not in previous], [area for area in previous if area not in areas]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the FDA areas containing a position")
+    parser.add_argument("lat", type=float)
+    parser.add_argument("lon", type=float)
+    parser.add_argument("--areas", nargs="*", help="area shapefiles (default: area_1..21.shp in the FDA area folder)")
+    parser.add_argument("--repeat", type=int, default=10000, help="queries to time")
+    args = parser.parse_args()
+
+    started = perf_counter()
+    index = AreaIndex.from_shapefiles(args.areas or None)
+    print(f"Indexed {len(index.names)} polygons in {perf_counter() - started:.3f} s")
+
+    print("Areas:", ", ".join(index.areas_at(args.lat, args.lon)) or "none")
+    started = perf_counter()
+    for _ in range(args.repeat):
+        index.areas_at(args.lat, args.lon)
+    print(f"{(perf_counter() - started) / args.repeat * 1e6:.1f} us per query")
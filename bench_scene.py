@@ -0,0 +1,64 @@
+import argparse
+import numpy as np
+import plotly.graph_objects as go
+from time import perf_counter
+import sim_gp_v3 as scene
+
+# Compares building the static approach scene as merged NaN-separated
+# traces (what sim_gp_v3 sends) against one trace per line segment (how it
+# used to be built): time to build the figure and its JSON, and JSON size.
+
+
+def split_trace(trace):
+    """One trace per polyline of a NaN-separated trace, styled like it"""
+    points = np.column_stack([np.asarray(trace[axis], dtype=float) for axis in "xyz"])
+    breaks = np.flatnonzero(np.isnan(points[:, 0]))
+    style = trace.to_plotly_json()
+    for axis in "xyz":
+        style.pop(axis)
+    traces = []
+    for line in np.split(points, breaks):
+        line = line[~np.isnan(line[:, 0])]
+        if len(line):
+            traces.append(go.Scatter3d(x=line[:, 0], y=line[:, 1], z=line[:, 2], **style))
+    return traces
+
+
+def build_merged():
+    return scene.create_ground_grid() + scene.create_approach_scene()
+
+
+def build_separate():
+    traces = []
+    for trace in build_merged():
+        traces.extend(split_trace(trace) if trace.mode == 'lines' else [trace])
+    return traces
+
+
+def measure(build, repeat):
+    build_times, json_times = [], []
+    for _ in range(repeat):
+        started = perf_counter()
+        figure = go.Figure(data=build(), layout=scene.get_default_layout())
+        built = perf_counter()
+        payload = figure.to_json()
+        build_times.append(built - started)
+        json_times.append(perf_counter() - built)
+    return len(figure.data), np.median(build_times), np.median(json_times), len(payload.encode())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sim_gp_v3 static scene")
+    parser.add_argument("--repeat", type=int, default=20, help="builds per layout (median reported)")
+    args = parser.parse_args()
+
+    print(f"{'layout':<10}{'traces':>8}{'build ms':>10}{'json ms':>10}{'bytes':>10}")
+    results = {}
+    for name, build in [("separate", build_separate), ("merged", build_merged)]:
+        results[name] = measure(build, args.repeat)
+        traces, build_time, json_time, size = results[name]
+        print(f"{name:<10}{traces:>8}{build_time * 1000:>10.2f}{json_time * 1000:>10.2f}{size:>10}")
+
+    before, after = results["separate"], results["merged"]
+    print(f"merged is {(before[1] + before[2]) / (after[1] + after[2]):.1f}x faster to build and send, "
+          f"{before[3] / after[3]:.1f}x smaller")
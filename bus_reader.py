@@ -0,0 +1,137 @@
+import json
+import threading
+from collections import deque
+from time import time
+import zmq
+from telemetry import is_announcement, subscribe
+
+
+class RecentRows:
+    """Lock-protected ring buffer of the latest (arrival time, row) pairs"""
+
+    def __init__(self, capacity=1000):
+        self.rows = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, row):
+        with self._lock:
+            self.rows.append((timestamp, row))
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.rows)
+
+
+# Decoder for the dashboard feed: one JSON object per message
+def decode_json(message):
+    return [json.loads(message)]
+
+
+class BusReader(threading.Thread):
+    """Drain a ZMQ SUB socket continuously on a background thread.
+
+    Every message is decoded into rows with `decode`; each row goes into
+    `history` (anything with an append(timestamp, row) method, a RecentRows
+    by default) and the newest one becomes `latest`. Dash callbacks read
+    these instead of receiving themselves, so the display never falls
+    behind a fast feed.
+
+    With latest_only=True each drain decodes and keeps only the newest
+    message (schema announcements are still decoded), so a display that
+    only needs the current value does constant work however fast the
+    feed.
+
+    lag() reports how far the display trails the bus: the age of the
+    latest row, and, when `time_of` extracts a source timestamp (unix
+    seconds) from a row, how long rows took to arrive.
+    """
+
+    def __init__(self, address, decode=decode_json, history=None, time_of=None, context=None,
+                 latest_only=False):
+        super().__init__(daemon=True)
+        self.address = address
+        self.decode = decode
+        self.latest_only = latest_only
+        self.history = history if history is not None else RecentRows()
+        self.time_of = time_of
+        self.context = context or zmq.Context.instance()
+        self.latest = None
+        self.latest_time = None
+        self.source_lag = None
+        self.received = 0
+        self.errors = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        # The socket is created and used only on this thread
+        socket = subscribe(self.context, self.address)
+        while not self._stop_event.is_set():
+            if not socket.poll(100):
+                continue
+            newest = None
+            while True:
+                try:
+                    message = socket.recv(flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                if not self.latest_only or is_announcement(message):
+                    self._add(message)
+                else:
+                    newest = message
+            if newest is not None:
+                self._add(newest)
+        socket.close()
+
+    def _add(self, message):
+        try:
+            rows = self.decode(message)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            return
+        if len(rows) == 0:
+            return
+        now = time()
+        for row in rows:
+            self.history.append(now, row)
+        row = rows[-1]
+        source_lag = None
+        if self.time_of is not None:
+            try:
+                source_lag = now - float(self.time_of(row))
+            except (TypeError, ValueError):
+                pass
+        with self._lock:
+            self.latest = row
+            self.latest_time = now
+            self.source_lag = source_lag
+            self.received += len(rows)
+
+    def snapshot(self):
+        """Return (latest row, arrival time, rows received so far) consistently"""
+        with self._lock:
+            return self.latest, self.latest_time, self.received
+
+    def lag(self):
+        """Seconds since the latest row arrived, and its source-to-arrival
+        delay when known (None when not)"""
+        with self._lock:
+            age = time() - self.latest_time if self.latest_time is not None else None
+            return age, self.source_lag
+
+    def describe(self):
+        age, source_lag = self.lag()
+        if age is None:
+            text = f"No message yet from {self.address}"
+        else:
+            text = f"{self.received} rows received, latest {age:.1f} s old"
+            if source_lag is not None:
+                text += f", arrived {source_lag:.2f} s after its timestamp"
+        if self.errors:
+            text += f", {self.errors} undecodable ({self.last_error})"
+        return text
+
+    def stop(self):
+        self._stop_event.set()
@@ -1,22 +1,18 @@
+import threading
 import time
-import zmq
+import uuid
 import dash
 from dash import html, dcc
 from dash.dependencies import Input, Output, State
 import dash_daq as daq
 from datetime import datetime
 import plotly.graph_objs as go
+from timeseries import RingSeries, downsample
+from bus_reader import BusReader
 
 # Initialize Dash
 app = dash.Dash(__name__)
 
-# Initialize ZMQ
-context = zmq.Context()
-socket = context.socket(zmq.SUB)
-socket.connect("tcp://127.0.0.1:5555")
-socket.setsockopt_string(zmq.SUBSCRIBE, "")
-socket.RCVTIMEO = 100
-
 # Constants for alerts
 ALERT_THRESHOLDS = {
     'egt': {'warning': 1600, 'critical': 1800},
@@ -37,103 +33,134 @@ AVAILABLE_PARAMETERS = [
     {'label': 'Time', 'value': 'time'},
 ]
 
-app.layout = html.Div([
-    # Stores and intervals
-    dcc.Store(id='data-store', data={'values': []}),
-    dcc.Interval(id='interval-component', interval=500),
+# Server-side history: 4 hours of a 10 Hz feed, plotted downsampled to
+# about one point per pixel of the graph whatever the window length
+HISTORY_CAPACITY = 4 * 3600 * 10
+history = RingSeries([param['value'] for param in AVAILABLE_PARAMETERS], HISTORY_CAPACITY)
+
+# Background reader draining the dashboard feed into the history. Lag is
+# measured against the bus timestamp the publisher forwards as source_time.
+bus = BusReader("tcp://127.0.0.1:5555", history=history, time_of=lambda row: row.get('source_time'))
+
+
+HISTORY_WINDOWS = [
+    {'label': 'Last 2 minutes', 'value': 120},
+    {'label': 'Last 15 minutes', 'value': 900},
+    {'label': 'Last hour', 'value': 3600},
+    {'label': 'Last 4 hours', 'value': 4 * 3600},
+]
+
 
-    # Header
-    html.Div([
-        html.H1("FDA - SMK Dashboard",
-                style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '20px'})
-    ]),
+def serve_layout():
+    return html.Div([
+        # Stores and intervals
+        dcc.Store(id='session-id', data=str(uuid.uuid4())),
+        dcc.Store(id='plot-width', data=800),
+        dcc.Interval(id='interval-component', interval=500),
 
-    # Main content container
-    html.Div([
-        # Left panel - Graph and controls
+        # Header
         html.Div([
-            # Parameter selection
-            html.Div([
-                html.Label("Select Parameters to Display:",
-                           style={'marginBottom': '10px', 'fontWeight': 'bold'}),
-                dcc.Dropdown(
-                    id='parameter-selector',
-                    options=AVAILABLE_PARAMETERS,
-                    value=['speed', 'egt_1'],  # Default selected parameters
-                    multi=True,
-                    style={'backgroundColor': '#f8f9fa'}
-                )
-            ], style={'marginBottom': '20px'}),
-
-            # Main graph
-            dcc.Graph(id='live-graph',
-                      style={'height': '50vh'})
-        ], style={'width': '60%', 'display': 'inline-block', 'padding': '20px'}),
-
-        # Right panel - Gauges and alerts
+            html.H1("FDA - SMK Dashboard",
+                    style={'textAlign': 'center', 'color': '#2c3e50', 'marginBottom': '20px'})
+        ]),
+
+        # Main content container
         html.Div([
-            # Speed and Elevation gauges
+            # Left panel - Graph and controls
             html.Div([
-                daq.Gauge(
-                    id='speed-gauge',
-                    label="Speed",
-                    value=0,
-                    max=200,
-                    min=0,
-                    color={'gradient': True,
-                           'ranges': {'green': [0, 150],
-                                      'yellow': [150, 180],
-                                      'red': [180, 200]}}
-                ),
-                daq.Tank(
-                    id='elevation-tank',
-                    label="Elevation",
-                    value=0,
-                    max=10000,
-                    min=0,
-                    style={'margin': '20px 0'}
-                )
-            ]),
-
-            # EGT Panel
+                # Parameter selection
+                html.Div([
+                    html.Label("Select Parameters to Display:",
+                               style={'marginBottom': '10px', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(
+                        id='parameter-selector',
+                        options=AVAILABLE_PARAMETERS,
+                        value=['speed', 'egt_1'],  # Default selected parameters
+                        multi=True,
+                        style={'backgroundColor': '#f8f9fa'}
+                    ),
+                    dcc.Dropdown(
+                        id='history-window',
+                        options=HISTORY_WINDOWS,
+                        value=120,
+                        clearable=False,
+                        style={'backgroundColor': '#f8f9fa', 'marginTop': '10px'}
+                    )
+                ], style={'marginBottom': '20px'}),
+
+                # Main graph
+                dcc.Graph(id='live-graph',
+                          style={'height': '50vh'})
+            ], style={'width': '60%', 'display': 'inline-block', 'padding': '20px'}),
+
+            # Right panel - Gauges and alerts
             html.Div([
-                html.H3("EGT Temperatures",
-                        style={'textAlign': 'center', 'marginBottom': '15px'}),
+                # Speed and Elevation gauges
                 html.Div([
+                    daq.Gauge(
+                        id='speed-gauge',
+                        label="Speed",
+                        value=0,
+                        max=200,
+                        min=0,
+                        color={'gradient': True,
+                               'ranges': {'green': [0, 150],
+                                          'yellow': [150, 180],
+                                          'red': [180, 200]}}
+                    ),
+                    daq.Tank(
+                        id='elevation-tank',
+                        label="Elevation",
+                        value=0,
+                        max=10000,
+                        min=0,
+                        style={'margin': '20px 0'}
+                    )
+                ]),
+
+                # EGT Panel
+                html.Div([
+                    html.H3("EGT Temperatures",
+                            style={'textAlign': 'center', 'marginBottom': '15px'}),
                     html.Div([
-                        daq.GraduatedBar(
-                            id=f'egt-{i}',
-                            label=f'EGT {i}',
-                            value=0,
-                            max=2000,
-                            step=100,
-                            color={'gradient': True,
-                                   'ranges': {'green': [0, 1600],
-                                              'yellow': [1600, 1800],
-                                              'red': [1800, 2000]}}
-                        ),
-                        html.Div(id=f'egt-{i}-value',
-                                 style={'textAlign': 'center', 'marginTop': '5px'})
-                    ], style={'width': '30%', 'margin': '10px'})
-                    for i in range(1, 7)
-                ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'center'})
-            ], style={'backgroundColor': '#f8f9fa', 'padding': '15px', 'borderRadius': '10px'}),
-
-            # Alerts panel
-            html.Div(id='alerts-panel',
-                     style={'marginTop': '20px', 'padding': '10px',
-                            'borderRadius': '5px', 'backgroundColor': '#f8f9fa'})
-        ], style={'width': '35%', 'display': 'inline-block', 'verticalAlign': 'top',
-                  'padding': '20px'})
-    ], style={'display': 'flex', 'justifyContent': 'space-between'}),
-
-    # Debug info (collapsed by default)
-    html.Details([
-        html.Summary("Debug Information"),
-        html.Div(id='debug-info'),
-        html.Div(id='last-update-time')
-    ], style={'marginTop': '20px'})
-], style={'padding': '20px', 'backgroundColor': '#ffffff'})
+                        html.Div([
+                            daq.GraduatedBar(
+                                id=f'egt-{i}',
+                                label=f'EGT {i}',
+                                value=0,
+                                max=2000,
+                                step=100,
+                                color={'gradient': True,
+                                       'ranges': {'green': [0, 1600],
+                                                  'yellow': [1600, 1800],
+                                                  'red': [1800, 2000]}}
+                            ),
+                            html.Div(id=f'egt-{i}-value',
+                                     style={'textAlign': 'center', 'marginTop': '5px'})
+                        ], style={'width': '30%', 'margin': '10px'})
+                        for i in range(1, 7)
+                    ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'center'})
+                ], style={'backgroundColor': '#f8f9fa', 'padding': '15px', 'borderRadius': '10px'}),
+
+                # Alerts panel
+                html.Div(id='alerts-panel',
+                         style={'marginTop': '20px', 'padding': '10px',
+                                'borderRadius': '5px', 'backgroundColor': '#f8f9fa'})
+            ], style={'width': '35%', 'display': 'inline-block', 'verticalAlign': 'top',
+                      'padding': '20px'})
+        ], style={'display': 'flex', 'justifyContent': 'space-between'}),
+
+        # Debug info (collapsed by default)
+        html.Details([
+            html.Summary("Debug Information"),
+            html.Div(id='debug-info'),
+            html.Div(id='last-update-time')
+        ], style={'marginTop': '20px'})
+    ], style={'padding': '20px', 'backgroundColor': '#ffffff'})
+
+
+# A new layout, and so a new session id, for every page load
+app.layout = serve_layout
 
 
 def check_alerts(data):
@@ -159,10 +186,110 @@ def check_alerts(data):
     return alerts
 
 
+# Measure the graph in the browser so the server sends one point per pixel
+app.clientside_callback(
+    """
+    function(n_intervals) {
+        var graph = document.getElementById('live-graph');
+        return graph && graph.offsetWidth ? graph.offsetWidth : window.innerWidth;
+    }
+    """,
+    Output('plot-width', 'data'),
+    Input('interval-component', 'n_intervals')
+)
+
+
+# Per-session state of what each browser already has, keyed by the session
+# id generated with its page: the history sample count it has seen, the
+# figure settings it was drawn with, and points appended since then.
+# Callbacks run on the server's worker threads, so the table is only
+# touched under sessions_lock.
+sessions = {}
+sessions_lock = threading.Lock()
+SESSION_TIMEOUT = 600
+
+
+def session_state(session_id):
+    now = time.time()
+    with sessions_lock:
+        for stale in [key for key, state in sessions.items() if now - state['seen'] > SESSION_TIMEOUT]:
+            del sessions[stale]
+        state = sessions.setdefault(session_id, {'total': -1, 'graph_total': 0, 'figure_key': None, 'appended': 0})
+        state['seen'] = now
+    return state
+
+
+def build_figure(selected_parameters, history_window, points, utc_offset):
+    # Create graph traces for selected parameters, downsampled to the graph width
+    times, series = history.snapshot(selected_parameters, since=time.time() - history_window)
+    traces = []
+    for param in selected_parameters:
+        x, y = downsample(times, series[param], points)
+        traces.append(go.Scatter(
+            x=((x + utc_offset) * 1000).astype('datetime64[ms]'),
+            y=y,
+            name=param.upper(),
+            mode='lines'
+        ))
+
+    return {
+        'data': traces,
+        'layout': {
+            'title': 'Selected Parameters Over Time',
+            'xaxis': {'title': 'Time'},
+            'yaxis': {'title': 'Value'},
+            'plot_bgcolor': '#f8f9fa',
+            'paper_bgcolor': '#f8f9fa',
+            'margin': {'l': 40, 'r': 40, 't': 40, 'b': 40}
+        }
+    }
+
+
+@app.callback(
+    [Output('live-graph', 'figure'),
+     Output('live-graph', 'extendData')],
+    [Input('interval-component', 'n_intervals'),
+     Input('parameter-selector', 'value'),
+     Input('history-window', 'value')],
+    [State('plot-width', 'data'),
+     State('session-id', 'data')]
+)
+def update_graph(n_intervals, selected_parameters, history_window, plot_width, session_id):
+    try:
+        state = session_state(session_id)
+        points = max(int(plot_width or 800), 100)
+        # Arrival times are UTC; show them in local time like the last update time
+        utc_offset = datetime.now().astimezone().utcoffset().total_seconds()
+
+        # Send a whole (downsampled) figure only when the settings change or
+        # the points appended since the last one would double the trace;
+        # otherwise send just the new points
+        figure_key = (tuple(selected_parameters), history_window, points)
+        if figure_key != state['figure_key'] or state['appended'] >= points:
+            state['graph_total'] = history.total
+            state['figure_key'] = figure_key
+            state['appended'] = 0
+            return build_figure(selected_parameters, history_window, points, utc_offset), dash.no_update
+
+        times, series, total = history.tail(state['graph_total'], selected_parameters)
+        state['graph_total'] = total
+        if len(times) == 0 or not selected_parameters:
+            return dash.no_update, dash.no_update
+        state['appended'] += len(times)
+        x = ((times + utc_offset) * 1000).astype('datetime64[ms]').astype(str).tolist()
+        extend = {
+            'x': [x for _ in selected_parameters],
+            'y': [series[param].tolist() for param in selected_parameters]
+        }
+        return dash.no_update, (extend, list(range(len(selected_parameters))), 2 * points)
+
+    except Exception as e:
+        print(f"Error in graph callback: {str(e)}")
+        return dash.no_update, dash.no_update
+
+
 @app.callback(
     [
-        Output('data-store', 'data'),
-        Output('live-graph', 'figure'),
         Output('speed-gauge', 'value'),
         Output('elevation-tank', 'value'),
         Output('alerts-panel', 'children'),
@@ -170,64 +297,26 @@ def check_alerts(data):
         Output('last-update-time', 'children')
     ] + [Output(f'egt-{i}', 'value') for i in range(1, 7)] +
     [Output(f'egt-{i}-value', 'children') for i in range(1, 7)],
-    [Input('interval-component', 'n_intervals'),
-     Input('parameter-selector', 'value')],
-    [State('data-store', 'data')]
+    [Input('interval-component', 'n_intervals')],
+    [State('session-id', 'data')]
 )
-def update_metrics(n_intervals, selected_parameters, stored_data):
+def update_metrics(n_intervals, session_id):
     try:
-        try:
-            message = socket.recv_json(flags=zmq.NOBLOCK)
-            debug_msg = "Successfully received ZMQ message"
-        except zmq.Again:
-            message = None
-            debug_msg = "No new ZMQ message"
-        except Exception as e:
-            message = None
-            debug_msg = f"ZMQ Error: {str(e)}"
-
+        state = session_state(session_id)
+        latest, _, received = bus.snapshot()
         current_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        debug_msg = bus.describe()
+        # Nothing new on the bus since this session's last update: only the
+        # status refreshes, so a stalled feed shows its growing lag
+        if received == state['total']:
+            return ((dash.no_update,) * 3 + (f"Debug: {debug_msg}", f"Last Update: {current_time}") +
+                    (dash.no_update,) * 12)
+        state['total'] = received
 
-        if message:
-            # Update stored data
-            stored_data['values'].append({
-                'time': message.get('time', 0), #time, #current_time,
-                'speed': message.get('speed', 0),
-                'elevation': message.get('elevation', 0),
-                **{f'egt_{i}': message.get(f'egt_{i}', 0) for i in range(1, 7)}
-            })
-            stored_data['values'] = stored_data['values'][-120:]
-
-            # Get latest values
-            latest_data = message
-        else:
-            latest_data = stored_data['values'][-1] if stored_data['values'] else {
-                'speed': 0, 'elevation': 0,
-                **{f'egt_{i}': 0 for i in range(1, 7)}
-            }
-
-        # Create graph traces for selected parameters
-        traces = []
-        for param in selected_parameters:
-            values = [item[param] for item in stored_data['values']]
-            times = [item['time'] for item in stored_data['values']]
-            traces.append(go.Scatter(
-                x=times,
-                y=values,
-                name=param.upper(),
-                mode='lines+markers'
-            ))
-
-        figure = {
-            'data': traces,
-            'layout': {
-                'title': 'Selected Parameters Over Time',
-                'xaxis': {'title': 'Time'},
-                'yaxis': {'title': 'Value'},
-                'plot_bgcolor': '#f8f9fa',
-                'paper_bgcolor': '#f8f9fa',
-                'margin': {'l': 40, 'r': 40, 't': 40, 'b': 40}
-            }
+        # Get latest values
+        latest_data = latest or {
+            'speed': 0, 'elevation': 0,
+            **{f'egt_{i}': 0 for i in range(1, 7)}
         }
 
         # Generate alerts
@@ -248,8 +337,6 @@ def update_metrics(n_intervals, selected_parameters, stored_data):
         egt_displays = [f"Temperature: {val}°F" for val in egt_values]
 
         return (
-            stored_data,  # data-store
-            figure,  # live-graph
             latest_data.get('speed', 0),  # speed-gauge
             latest_data.get('elevation', 0),  # elevation-tank
             alerts_panel,  # alerts-panel
@@ -265,4 +352,5 @@ def update_metrics(n_intervals, selected_parameters, stored_data):
 
 
 if __name__ == '__main__':
+    bus.start()
     app.run_server(debug=True)
\ No newline at end of file
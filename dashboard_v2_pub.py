@@ -1,6 +1,8 @@
 import zmq
 import time
 import random
+from datetime import datetime
+from telemetry import FieldDecoder, recv_latest, subscribe
 
 # Set up ZMQ publisher
 context = zmq.Context()
@@ -8,51 +10,36 @@ socket = context.socket(zmq.PUB)
 socket.bind("tcp://127.0.0.1:5555")  # Ensure this matches the port in your subscriber
 
 context = zmq.Context()
-socket_sub = context.socket(zmq.SUB)
-socket_sub.connect("tcp://localhost:1137")
-socket_sub.setsockopt_string(zmq.SUBSCRIBE, '')
+socket_sub = subscribe(context, "tcp://localhost:1137")
 
-def generate_random_data():
-    """Generate random data for all fields."""
-    message = socket_sub.recv_string()
-    row_data = message.split("|")
-
-    altitude = float(row_data[6])
-    speed = float(row_data[7])
-
-    egt_1 = float(row_data[83])
-    egt_2 = float(row_data[81])
-    egt_3 = float(row_data[79])
-    egt_4 = float(row_data[77])
-    egt_5 = float(row_data[75])
-    egt_6 = float(row_data[73])
+# Fields forwarded to the dashboard, decoded by name from the bus message
+DASHBOARD_FIELDS = (["speed", "altitude"] + [f"egt_{i}" for i in range(1, 7)] +
+                    [f"cht_{i}" for i in range(1, 7)] + ["time"])
+decoder = FieldDecoder(DASHBOARD_FIELDS + ["timestamp"])
 
-    cht_1 = float(row_data[82])
-    cht_2 = float(row_data[80])
-    cht_3 = float(row_data[78])
-    cht_4 = float(row_data[76])
-    cht_5 = float(row_data[74])
-    cht_6 = float(row_data[72])
+def source_time(timestamp):
+    """Unix seconds of a bus timestamp (local time, YYYYmmddHHMMSS), or
+    None for sources that stamp rows another way"""
+    try:
+        return datetime.strptime(timestamp, "%Y%m%d%H%M%S").timestamp()
+    except ValueError:
+        return None
 
-    time_rec = row_data[14]
-
-    return {
-        "speed": speed, #random.randint(0, 200),  # Speed in knots
-        "elevation": altitude, #random.randint(0, 4000),  # Elevation in ft
-        "egt_1": egt_1, #random.randint(1000, 2000), # 84
-        "egt_2": egt_2, #random.randint(1000, 2000), # 82
-        "egt_3": egt_3, #random.randint(1000, 2000), # 80
-        "egt_4": egt_4, #random.randint(1000, 2000), # 78
-        "egt_5": egt_5, #random.randint(1000, 2000), # 76
-        "egt_6": egt_6, #random.randint(1000, 2000), # 74
-        "cht_1": cht_1, #random.randint(500, 1000), # 83
-        "cht_2": cht_2, #random.randint(500, 1000), # 81
-        "cht_3": cht_3, #random.randint(500, 1000), # 79
-        "cht_4": cht_4, #random.randint(500, 1000), # 77
-        "cht_5": cht_5, #random.randint(500, 1000), # 75
-        "cht_6": cht_6, #random.randint(500, 1000),  # 73
-        "time":  time_rec, # time.strftime("%H:%M:%S", row_data[14])  #time.strftime("%H:%M:%S"),  # Current time   float(row_data[14])
-    }
+def generate_random_data():
+    """Read the newest telemetry row and pick out the dashboard fields."""
+    # Forward only the latest row each time round, however many arrived
+    # since; a multi-row frame contributes its newest row
+    rows = []
+    while len(rows) == 0:
+        socket_sub.poll()
+        rows = recv_latest(socket_sub, decoder)
+    *values, timestamp = rows[-1]
+    data = dict(zip(DASHBOARD_FIELDS, values))
+    # The dashboard calls altitude "elevation"
+    data["elevation"] = data.pop("altitude")
+    # Lets the dashboard tell how far it trails the source
+    data["source_time"] = source_time(timestamp)
+    return data
 
 print("Publisher started...")
 
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+from telemetry import field_name
+from recorder import is_recording, read_recording
+from replay import read_flight
+
+# A flight store is one directory per aircraft holding a sorted time index
+# (time.npy, seconds since the epoch) and one .npy file per field, all in
+# the same row order. Queries binary-search the time index and slice the
+# memory-mapped columns, so only the requested window is ever read.
+COLUMNS_FILE = "columns.json"
+TIME_FILE = "time.npy"
+
+
+# Seconds since the epoch for every row, with the sub-second part of GPS
+# Date & Time when it is known and the whole-second unix_time otherwise
+def row_times(data_df, fallback=None):
+    if "GPS Date & Time" in data_df.columns:
+        times = pd.to_datetime(data_df["GPS Date & Time"], errors='coerce')
+        if times.dt.tz is not None:
+            times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+        if times.notna().all():
+            return times.to_numpy().astype('datetime64[us]').astype(np.int64) / 1e6
+    if "unix_time" in data_df.columns:
+        return pd.to_numeric(data_df["unix_time"], errors='coerce').to_numpy(dtype=np.float64)
+    return np.asarray(fallback, dtype=np.float64)
+
+
+# Field arrays for a chunk: numbers as float64, everything else as text.
+# Datetime columns are left out; row_times already gives them as time.npy.
+def field_arrays(data_df):
+    fields = {}
+    for col in data_df.columns:
+        values = data_df[col]
+        if values.dtype.kind == 'M':
+            continue
+        name = field_name(col) or "field"
+        while name in fields:
+            name += "_"
+        if values.dtype.kind not in 'biuf':
+            numbers = pd.to_numeric(values, errors='coerce')
+            # Text columns from a recording that hold numbers are stored as numbers
+            values = numbers if numbers.notna().sum() == values.notna().sum() else values.astype(str)
+        fields[name] = values.to_numpy(dtype=np.float64 if values.dtype.kind in 'biuf' else str)
+    return fields
+
+
+# Directory name for an aircraft identity
+def aircraft_key(aircraft):
+    return re.sub(r'[^0-9A-Za-z_.-]+', '_', str(aircraft).strip()) or "unknown"
+
+
+class FlightStore:
+    """Per-aircraft, time-indexed columns of recorded flights"""
+
+    def __init__(self, directory, aircraft_field="identity"):
+        self.directory = directory
+        self.aircraft_field = aircraft_field
+        self._open = {}  # aircraft -> (times, {field: memmap})
+
+    def aircraft(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.exists(os.path.join(self.directory, name, COLUMNS_FILE)))
+
+    def fields(self, aircraft):
+        return list(self._columns(aircraft)[1])
+
+    def _columns(self, aircraft):
+        aircraft = aircraft_key(aircraft)
+        if aircraft not in self._open:
+            directory = os.path.join(self.directory, aircraft)
+            with open(os.path.join(directory, COLUMNS_FILE)) as columns_file:
+                files = json.load(columns_file)
+            times = np.load(os.path.join(directory, TIME_FILE), mmap_mode='r')
+            columns = {field: np.load(os.path.join(directory, file), mmap_mode='r') for field, file in files.items()}
+            self._open[aircraft] = (times, columns)
+        return self._open[aircraft]
+
+    def query(self, aircraft, fields, start_time=None, end_time=None):
+        """Return {"time": ..., field: ...} arrays for rows with start_time <= time <= end_time"""
+        times, columns = self._columns(aircraft)
+        missing = [field for field in fields if field not in columns]
+        if missing:
+            raise ValueError(f"Unknown fields for {aircraft}: {', '.join(missing)}")
+        first = np.searchsorted(times, start_time, side='left') if start_time is not None else 0
+        last = np.searchsorted(times, end_time, side='right') if end_time is not None else len(times)
+        result = {"time": np.asarray(times[first:last])}
+        for field in fields:
+            result[field] = np.asarray(columns[field][first:last])
+        return result
+
+    def ingest(self, path):
+        """Add a flight CSV or a bus recording to the store, merged per aircraft
+        by time. Rows the store already holds are not added again."""
+        parts = {}
+        if is_recording(path):
+            chunks = read_recording(path)
+        else:
+            chunks = ((chunk, None) for chunk in read_flight(path))
+        for chunk, recv_time in chunks:
+            times = row_times(chunk, recv_time)
+            fields = field_arrays(chunk)
+            if self.aircraft_field in fields:
+                keys = fields[self.aircraft_field].astype(str)
+            else:
+                keys = np.full(len(times), os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0])
+            for aircraft in np.unique(keys):
+                rows = keys == aircraft
+                parts.setdefault(aircraft_key(aircraft), []).append(
+                    (times[rows], {field: values[rows] for field, values in fields.items()}))
+
+        for aircraft, chunks in parts.items():
+            self._write(aircraft, chunks)
+        return {aircraft: sum(len(times) for times, _ in chunks) for aircraft, chunks in parts.items()}
+
+    def _write(self, aircraft, chunks):
+        directory = os.path.join(self.directory, aircraft)
+        if os.path.exists(os.path.join(directory, COLUMNS_FILE)):
+            stored_times, stored = self._columns(aircraft)
+            chunks = [(np.array(stored_times), {field: np.array(values) for field, values in stored.items()})] + chunks
+            del stored_times, stored
+        self._open.pop(aircraft, None)
+
+        times = np.concatenate([chunk_times for chunk_times, _ in chunks])
+        names = []
+        for _, chunk_fields in chunks:
+            names += [field for field in chunk_fields if field not in names]
+        columns = []
+        for field in names:
+            pieces = []
+            for chunk_times, chunk_fields in chunks:
+                values = chunk_fields.get(field)
+                if values is None:
+                    # Field absent from this flight
+                    values = np.full(len(chunk_times), np.nan)
+                pieces.append(values)
+            if any(piece.dtype.kind == 'U' for piece in pieces):
+                pieces = [piece.astype(str) for piece in pieces]
+            columns.append(np.concatenate(pieces))
+
+        # Rows already stored, from the same file ingested again or an
+        # overlapping recording, are kept once: the first of each identical
+        # (time, fields) row, then everything sorted by time
+        rows = pd.DataFrame(dict(enumerate([times] + columns)))
+        kept = np.flatnonzero(~rows.duplicated().to_numpy())
+        order = kept[np.argsort(times[kept], kind='stable')]
+
+        os.makedirs(directory, exist_ok=True)
+        files = {}
+        for i, (field, values) in enumerate(zip(names, columns)):
+            files[field] = f"col_{i}.npy"
+            self._save(directory, files[field], values[order])
+        self._save(directory, TIME_FILE, times[order])
+        # Written last, so readers never see a column list without its files
+        with open(os.path.join(directory, COLUMNS_FILE), "w") as columns_file:
+            json.dump(files, columns_file)
+
+    @staticmethod
+    def _save(directory, file_name, values):
+        # Replace rather than overwrite, so open memory maps of the old file stay valid
+        path = os.path.join(directory, file_name)
+        np.save(path + ".tmp.npy", values)
+        os.replace(path + ".tmp.npy", path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time-indexed store of recorded flights")
+    parser.add_argument("--store", default="flight_store", help="store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="add flight CSVs or bus recordings to the store")
+    ingest_parser.add_argument("paths", nargs="+")
+    ingest_parser.add_argument("--aircraft-field", default="identity",
+                               help="field whose value identifies the aircraft of each row")
+
+    query_parser = commands.add_parser("query", help="print fields of one aircraft over a time window")
+    query_parser.add_argument("aircraft", nargs="?", help="aircraft to query (lists the stored aircraft if omitted)")
+    query_parser.add_argument("--fields", nargs="*", default=[])
+    query_parser.add_argument("--start", type=float, help="first time, in unix seconds")
+    query_parser.add_argument("--end", type=float, help="last time, in unix seconds")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        store = FlightStore(args.store, args.aircraft_field)
+        for path in args.paths:
+            for aircraft, rows in store.ingest(path).items():
+                print(f"Ingested {rows} rows for {aircraft} from {path}")
+    else:
+        store = FlightStore(args.store)
+        if args.aircraft is None:
+            for aircraft in store.aircraft():
+                print(f"{aircraft}: {', '.join(store.fields(aircraft))}")
+        else:
+            result = store.query(args.aircraft, args.fields, args.start, args.end)
+            print(pd.DataFrame(result).to_string(max_rows=20))
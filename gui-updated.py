@@ -16,8 +16,10 @@ from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 import pickle
 from qgis.core import QgsMarkerSymbol
+from telemetry import FieldDecoder, recv_all, subscribe
 
 HEADING_2 = 0.0
+decoder = FieldDecoder(['identity', 'mode', 'phase', 'latitude', 'longitude', 'heading'])
 
 
 def update_angle(new_angle):
@@ -70,9 +72,14 @@ class MyDialog(QDialog):
         self.alert_timer.start(500)  # Check every 500ms
 
     def check_for_alerts(self):
+        # The rule engine only publishes alert transitions, so drain them all
         try:
-            message = self.sub_socket.recv_string(flags=zmq.NOBLOCK)
-            self.bar.pushMessage("Alert: ", message, level=Qgis.Critical, duration=5)
+            while True:
+                message = self.sub_socket.recv_string(flags=zmq.NOBLOCK)
+                if message.startswith("Cleared"):
+                    self.bar.pushMessage("Cleared: ", message, level=Qgis.Info, duration=5)
+                else:
+                    self.bar.pushMessage("Alert: ", message, level=Qgis.Critical, duration=5)
         except zmq.Again:
             pass  # No message received
 
@@ -94,41 +101,49 @@ def plot_points(random_points, point_layer, canvas):
 
 
 def update_canvas(point_layer, canvas):
+    global HEADING_2
+    # Every row since the last tick is checked against the FDA areas;
+    # only the newest is drawn
+    rows = recv_all(socket, decoder)
+    if len(rows) == 0:
+        print('No data on the port... Waiting ....')
+        return
+    latitude, longitude, heading = rows[-1][3:]
+
     feature_ids = [feature.id() for feature in point_layer.getFeatures()]
     point_layer.dataProvider().deleteFeatures(feature_ids)
-    global HEADING_2
-    try:
-        message = socket.recv_string(flags=zmq.NOBLOCK)
-        row_data = message.split("|")
-        system_time = 112233
-        longitude = float(row_data[4])
-        latitude = float(row_data[5])
-        update_angle(float(row_data[17]))
-        print("Updated HEADING_2:", HEADING_2)
-        random_points = [longitude, latitude, 90, system_time]
-        plot_points(random_points, point_layer, canvas)
-
-        # Reapply the symbol with the updated angle
-        style = QgsStyle.defaultStyle()
-        style_angle = style.symbol('topo airport')
-        style_angle.setAngle(HEADING_2)
-        style_angle.setColor(Qt.green)
-        point_layer.renderer().setSymbol(style_angle)
-
-        # Refresh the layer and canvas
-        point_layer.triggerRepaint()
-        canvas.refresh()
+    system_time = 112233
+    update_angle(heading)
+    print("Updated HEADING_2:", HEADING_2)
+    random_points = [latitude, longitude, 90, system_time]
+    plot_points(random_points, point_layer, canvas)
+
+    # Report FDA area entries and exits of each aircraft, in the order its
+    # positions arrived. Aircraft are keyed like the rule engine's alerts.
+    if area_tracker is not None:
+        for row in rows:
+            aircraft = "/".join(row[:3])
+            entered, exited = area_tracker.update(aircraft, row[3], row[4])
+            for area in entered:
+                myDlg.bar.pushMessage("Area: ", f"{aircraft} entered {area}", level=Qgis.Info, duration=5)
+            for area in exited:
+                myDlg.bar.pushMessage("Area: ", f"{aircraft} left {area}", level=Qgis.Info, duration=5)
+
+    # Reapply the symbol with the updated angle
+    style = QgsStyle.defaultStyle()
+    style_angle = style.symbol('topo airport')
+    style_angle.setAngle(HEADING_2)
+    style_angle.setColor(Qt.green)
+    point_layer.renderer().setSymbol(style_angle)
 
-    except zmq.Again:
-        print('No data on the port... Waiting ....')
+    # Refresh the layer and canvas
+    point_layer.triggerRepaint()
+    canvas.refresh()
 
 
 if __name__ == '__main__':
     context = zmq.Context()
-    socket = context.socket(zmq.SUB)
-    socket.connect("tcp://localhost:1137")
-    socket.subscribe(b"")
-    socket.setsockopt(zmq.RCVTIMEO, 1000)
+    socket = subscribe(context, "tcp://localhost:1137")
     QGIS_PATH = r'C:\Program Files\QGIS 3.22.3\apps\qgis'
     QgsApplication.setPrefixPath(QGIS_PATH, True)
     app = QApplication(sys.argv)
@@ -228,6 +243,15 @@ if __name__ == '__main__':
     fda21 = QgsVectorLayer(fda_area21, "area File", "ogr")
     fda21.renderer().symbol().setColor(Qt.yellow)
 
+    # The same areas indexed once for point-in-area queries; the map still
+    # works without them when shapely or pyshp is missing
+    try:
+        from area_index import AreaIndex, AreaTracker
+        area_tracker = AreaTracker(AreaIndex.from_shapefiles())
+    except Exception as e:
+        print(f"FDA areas not indexed: {e}")
+        area_tracker = None
+
     # ===== Add ECW raster layers instead of TIFF =====
     # 50000 Scale Map
     map_50k_path = r'D:\ECW\50000 SCALE IMAGE MAP.ecw'  # Update with actual path
@@ -2,9 +2,11 @@ import sys
 # import zmq
 # from consts import *
 
-import pandas as pd
+import numpy as np
 import zmq
 from datetime import datetime
+from telemetry import FramePublisher, FrameDecoder, recv_frame
+from replay import FlightLoader, ReplayScheduler
 from qgis.core import *
 from qgis.utils import *
 from qgis.gui import *
@@ -23,6 +25,88 @@ from PyQt5.QtCore import *
 
 
 
+class RingTableModel(QAbstractTableModel):
+    """Table model over a fixed-capacity ring buffer of the latest rows.
+
+    Rows are stored as object references in a (capacity x columns) NumPy
+    array and only turned into display text when the view asks for a
+    visible cell, so memory and per-tick cost stay bounded however long
+    the replay runs.
+    """
+
+    def __init__(self, capacity=10000, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self.columns = []
+        self._data = np.empty((capacity, 0), dtype=object)
+        self._start = 0        # buffer slot of the oldest row
+        self._count = 0
+        self._total = 0        # rows appended since the last reset
+
+    def set_columns(self, columns):
+        self.beginResetModel()
+        self.columns = list(columns)
+        self._data = np.empty((self.capacity, len(self.columns)), dtype=object)
+        self._start = self._count = self._total = 0
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        value = self._data[(self._start + index.row()) % self.capacity, index.column()]
+        return None if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        # Rows are numbered by arrival, so evicted rows keep their numbers
+        return str(self._total - self._count + section + 1)
+
+    def _block(self, rows):
+        # Lay a batch of rows out as (n x columns) cells
+        width = len(self.columns)
+        block = np.empty((len(rows), width), dtype=object)
+        if isinstance(rows, np.ndarray) and rows.dtype.names:
+            for j, name in enumerate(rows.dtype.names[:width]):
+                block[:, j] = rows[name].tolist()
+        else:
+            for i, row in enumerate(rows):
+                row = row[:width]
+                block[i, :len(row)] = row
+        return block
+
+    def append_rows(self, batches):
+        """Append batches of rows in one insert, evicting the oldest beyond capacity"""
+        if not batches or not self.columns:
+            return
+        block = np.concatenate([self._block(rows[-self.capacity:]) for rows in batches])[-self.capacity:]
+        n = len(block)
+        if n == 0:
+            return
+
+        evict = max(self._count + n - self.capacity, 0)
+        if evict:
+            self.beginRemoveRows(QModelIndex(), 0, evict - 1)
+            self._start = (self._start + evict) % self.capacity
+            self._count -= evict
+            self.endRemoveRows()
+
+        self.beginInsertRows(QModelIndex(), self._count, self._count + n - 1)
+        slots = (self._start + self._count + np.arange(n)) % self.capacity
+        self._data[slots] = block
+        self._count += n
+        self._total += n
+        self.endInsertRows()
+
+
 class ZMQPlayer(QWidget):
     def __init__(self):
         super().__init__()
@@ -35,6 +119,7 @@ class ZMQPlayer(QWidget):
         self.subscriber_socket = self.context.socket(zmq.SUB)
         self.subscriber_socket.connect("tcp://127.0.0.1:1137")
         self.subscriber_socket.setsockopt_string(zmq.SUBSCRIBE, "")
+        self.decoder = FrameDecoder()
 
         # Define global variables
         self.is_playing = False
@@ -42,14 +127,23 @@ class ZMQPlayer(QWidget):
         self.current_speed = 1.0
         self.current_position = 0
 
-        self.data_df = pd.DataFrame()
+        self.flight_path = None
+        self.loader = None
+        self.flight = None
+        self.publisher = None
+
+        # Rows are sent by the scheduler thread at their recorded GPS times;
+        # the publisher socket is only used from that thread
+        self.scheduler = ReplayScheduler()
+        self.scheduler.start()
 
         # Setup UI
         self.init_ui()
 
-        # Setup timer for playback and subscriber
+        # Setup timer for playback and loading progress, and subscriber
         self.playback_timer = QTimer()
-        self.playback_timer.timeout.connect(self.stream_data)
+        self.playback_timer.timeout.connect(self.update_progress)
+        self.playback_timer.start(100)
 
         self.subscriber_timer = QTimer()
         self.subscriber_timer.timeout.connect(self.receive_data)
@@ -88,74 +182,121 @@ class ZMQPlayer(QWidget):
         self.speed_dropdown.currentTextChanged.connect(self.set_speed)
         layout.addWidget(self.speed_dropdown)
 
-        # Subscriber Output Table
-        self.subscriber_table = QTableWidget()
+        # Publish binary telemetry frames instead of pipe-delimited text
+        self.binary_checkbox = QCheckBox("Binary frames")
+        self.binary_checkbox.toggled.connect(lambda checked: self.encode_flight())
+        layout.addWidget(self.binary_checkbox)
+
+        # Opt in to a columnar cache next to the CSV, for faster reloads
+        self.cache_checkbox = QCheckBox("Cache decoded CSV next to the file")
+        layout.addWidget(self.cache_checkbox)
+
+        # Replay timing: lag of sent rows behind their scheduled time
+        self.stats_label = QLabel("")
+        layout.addWidget(self.stats_label)
+
+        # Subscriber Output Table, holding only the latest rows
+        self.subscriber_model = RingTableModel()
+        self.subscriber_table = QTableView()
+        self.subscriber_table.setModel(self.subscriber_model)
         layout.addWidget(self.subscriber_table)
 
         self.setLayout(layout)
         self.setWindowTitle("ZMQ Player")
 
     def load_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "", "CSV Files (*.csv);;All Files (*)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "",
+                                                   "CSV Files (*.csv);;Recordings (index.csv);;All Files (*)")
         if file_path:
-            self.data_df = pd.read_csv(file_path)
-
-            # Use GPS Date & Time as the timestamp
-            self.data_df["GPS Date & Time"] = pd.to_datetime(self.data_df["GPS Date & Time"], errors='coerce')
-            self.data_df = self.data_df.dropna(subset=["GPS Date & Time"])
-            self.data_df["unix_time"] = self.data_df["GPS Date & Time"].apply(lambda x: int(x.timestamp()))
-
-            self.slider.setMaximum(len(self.data_df) - 1)
-
-            # Update subscriber table to match CSV columns
-            self.subscriber_table.setColumnCount(len(self.data_df.columns))
-            self.subscriber_table.setHorizontalHeaderLabels(self.data_df.columns)
+            self.flight_path = file_path
+            self.encode_flight()
+
+    def encode_flight(self):
+        # Rows are read and pre-encoded in chunks on a loader thread, using
+        # the columnar cache next to the CSV when it is enabled. Playback
+        # can start as soon as the first chunk is ready; the playback timer
+        # picks the flight up then (attach_flight), so the window never
+        # waits on the loader.
+        if self.flight_path is None:
+            return
+        if self.loader is not None:
+            self.loader.stop()
+        self.loader = FlightLoader(self.flight_path, binary=self.binary_checkbox.isChecked(),
+                                   cache=self.cache_checkbox.isChecked())
+        self.loader.start()
+
+    def attach_flight(self):
+        # Switch to the loader's flight once its first chunk is encoded
+        if self.loader is None or self.flight is self.loader.flight or not self.loader.ready.is_set():
+            return
+        self.flight = self.loader.flight
+        self.publisher = FramePublisher(self.socket, self.flight.schema, binary=self.flight.binary)
+        self.scheduler.load(self.flight, self.publisher)
+        self.slider.setMaximum(max(len(self.flight) - 1, 0))
+
+        # Update subscriber table to match the flight's columns
+        self.subscriber_model.set_columns(self.flight.columns)
 
     def play(self):
+        if self.flight is None:
+            return
         self.is_playing = True
         self.is_stopped = False
-        self.playback_timer.start(int(1000 / self.current_speed))
+        self.scheduler.play()
 
     def pause(self):
         self.is_playing = False
-        self.playback_timer.stop()
+        self.scheduler.pause()
 
     def stop(self):
         self.is_playing = False
         self.is_stopped = True
-        self.playback_timer.stop()
+        self.scheduler.pause()
         self.current_position = 0
         self.slider.setValue(0)
+        self.scheduler.seek(0)
 
     def seek(self):
         self.current_position = self.slider.value()
+        self.scheduler.seek(self.current_position)
 
     def set_speed(self, speed_text):
         self.current_speed = float(speed_text.replace("x", ""))
-        if self.is_playing:
-            self.playback_timer.start(int(10 / self.current_speed))
-
-    def stream_data(self):
-        if self.is_playing and self.current_position < len(self.data_df):
-            row = self.data_df.iloc[self.current_position]
-            message = "|".join(str(row[col]) for col in self.data_df.columns)
-            self.socket.send_string(message)
-            self.current_position += 1
-            self.slider.setValue(self.current_position)
-        elif self.current_position >= len(self.data_df):
+        self.scheduler.set_speed(self.current_speed)
+
+    def update_progress(self):
+        self.attach_flight()
+        if self.flight is None:
+            return
+        # Follow the scheduler and the loader without feeding the position
+        # back through seek()
+        self.current_position = self.scheduler.position
+        self.slider.blockSignals(True)
+        self.slider.setMaximum(max(len(self.flight) - 1, 0))
+        self.slider.setValue(self.current_position)
+        self.slider.blockSignals(False)
+
+        status = self.scheduler.stats.summary()
+        if self.flight.loading:
+            status = f"Loading: {len(self.flight)} rows. {status}"
+        elif not self.flight.complete:
+            status = f"Load failed after {len(self.flight)} rows ({self.loader.error}). {status}"
+        self.stats_label.setText(status)
+        if self.is_playing and self.scheduler.finished:
             self.stop()
 
     def receive_data(self):
+        # Collect everything that arrived since the last tick and append it
+        # to the table in one go
+        batches = []
         try:
             while True:
-                message = self.subscriber_socket.recv_string(flags=zmq.NOBLOCK)
-                row_data = message.split("|")
-                row_count = self.subscriber_table.rowCount()
-                self.subscriber_table.insertRow(row_count)
-                for col_index, value in enumerate(row_data):
-                    self.subscriber_table.setItem(row_count, col_index, QTableWidgetItem(value))
+                rows = self.decoder.decode(recv_frame(self.subscriber_socket, flags=zmq.NOBLOCK))
+                if len(rows):
+                    batches.append(rows)
         except zmq.Again:
             pass
+        self.subscriber_model.append_rows(batches[-self.subscriber_model.capacity:])
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,260 @@
+import argparse
+import csv
+import glob
+import os
+import queue
+import threading
+import numpy as np
+import pandas as pd
+import zmq
+from time import time, process_time, sleep
+from telemetry import FRAME_MAGIC, SCHEMA_MAGIC, HEADER, FrameDecoder, TelemetrySchema, read_header
+
+# Recordings are a directory of compressed segment files plus one index.
+# Each segment holds a run of rows with the same layout (a text field count
+# or a binary schema) as one column array per field, with the receive time
+# of every row. The index is sparse: one entry every few thousand rows.
+INDEX_FILE = "index.csv"
+INDEX_FIELDS = ["segment", "row", "recv_time"]
+
+
+def segment_name(number):
+    return f"segment_{number:06d}.npz"
+
+
+def is_recording(path):
+    return os.path.isdir(path) or os.path.basename(path) == INDEX_FILE
+
+
+def recording_directory(path):
+    return path if os.path.isdir(path) else os.path.dirname(path)
+
+
+class SegmentWriter(threading.Thread):
+    """Columnarise, compress and index closed segments off the receive loop"""
+
+    def __init__(self, directory, header=None, index_interval=1000):
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.header = list(header) if header is not None else []
+        self.index_interval = index_interval
+        self.pending = queue.Queue()
+        existing = sorted(glob.glob(os.path.join(directory, "segment_*.npz")))
+        self.number = int(os.path.basename(existing[-1])[8:14]) + 1 if existing else 0
+
+    def text_columns(self, messages):
+        # One bytes column per field; every message of a segment has the same field count
+        fields = np.array([bytes(message).split(b"|") for message in messages], dtype=bytes)
+        columns = self.header[:fields.shape[1]]
+        columns += [f"field_{j}" for j in range(len(columns), fields.shape[1])]
+        return columns, [fields[:, j] for j in range(fields.shape[1])]
+
+    def binary_columns(self, schema, messages):
+        payload = b"".join(bytes(message[HEADER.size:]) for message in messages)
+        records = np.frombuffer(payload, dtype=schema.dtype)
+        return schema.columns, [records[name] for name in schema.dtype.names]
+
+    def write(self, schema, messages, recv_time):
+        if schema is None:
+            columns, arrays = self.text_columns(messages)
+        else:
+            columns, arrays = self.binary_columns(schema, messages)
+        description = TelemetrySchema(columns, [array.dtype.str for array in arrays]).description
+
+        name = segment_name(self.number)
+        self.number += 1
+        path = os.path.join(self.directory, name)
+        np.savez_compressed(path + ".tmp.npz", recv_time=recv_time,
+                            schema=np.frombuffer(description, dtype=np.uint8),
+                            binary=schema is not None,
+                            **{f"c{j}": array for j, array in enumerate(arrays)})
+        # Only complete segments are ever visible under their final name
+        os.replace(path + ".tmp.npz", path)
+
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        rows = list(range(0, len(recv_time), self.index_interval))
+        if rows[-1] != len(recv_time) - 1:
+            rows.append(len(recv_time) - 1)
+        new_index = not os.path.exists(index_path)
+        with open(index_path, "a", newline="") as index_file:
+            writer = csv.writer(index_file)
+            if new_index:
+                writer.writerow(INDEX_FIELDS)
+            writer.writerows((name, row, repr(float(recv_time[row]))) for row in rows)
+        return name, os.path.getsize(path)
+
+    def run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            try:
+                name, size = self.write(*item)
+                print(f"Wrote {name}: {len(item[2])} rows, {size} bytes")
+            except Exception as e:
+                print(f"Error writing segment: {e}")
+
+
+class Recorder:
+    """Collect bus messages into segments and hand closed segments to a SegmentWriter.
+
+    The receive path only stores the message buffer and its receive time;
+    a segment closes when it reaches `segment_rows` rows, is older than
+    `segment_seconds`, or the message layout changes.
+    """
+
+    def __init__(self, writer, segment_rows=100000, segment_seconds=60.0):
+        self.writer = writer
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.frames = FrameDecoder()
+        self.rows = 0
+        self.dropped = 0
+        self._reset()
+
+    def _reset(self):
+        self.layout = None
+        self.schema = None
+        self.messages = []
+        self.times = []
+        self.count = 0
+        self.started = None
+
+    def layout_of(self, buffer):
+        """(layout, schema, rows) of a message, or None for messages that are not rows"""
+        magic = bytes(buffer[:4])
+        if magic == SCHEMA_MAGIC:
+            self.frames.decode_frame(buffer)
+            return None
+        if magic == FRAME_MAGIC:
+            schema = self.frames.schemas.get(HEADER.unpack_from(buffer)[1])
+            if schema is None:
+                self.dropped += 1
+                return None
+            return ('binary', schema.id), schema, (len(buffer) - HEADER.size) // schema.dtype.itemsize
+        return ('text', bytes(buffer).count(b"|")), None, 1
+
+    def add(self, buffer, now):
+        layout = self.layout_of(buffer)
+        if layout is None:
+            return
+        layout, schema, rows = layout
+        if self.messages and (layout != self.layout or self.count >= self.segment_rows):
+            self.flush()
+        if not self.messages:
+            self.layout, self.schema, self.started = layout, schema, now
+        self.messages.append(buffer)
+        self.times.append((now, rows))
+        self.count += rows
+        self.rows += rows
+
+    def flush(self):
+        if self.messages:
+            times, counts = zip(*self.times)
+            recv_time = np.repeat(np.array(times, dtype=np.float64), counts)
+            self.writer.pending.put((self.schema, self.messages, recv_time))
+        self._reset()
+
+    def due(self, now):
+        return self.started is not None and now - self.started >= self.segment_seconds
+
+
+# Receive in bursts: sleeping between drains lets messages queue up in the
+# socket, so the recorder wakes a few times a second instead of once per
+# message.
+def record(zmq_port, recorder, drain_interval=0.05, report_interval=10.0):
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.connect(zmq_port)
+    socket.setsockopt_string(zmq.SUBSCRIBE, '')  # Subscribe to all messages
+    socket.setsockopt(zmq.RCVHWM, 0)
+
+    print(f"Recording {zmq_port} to {recorder.writer.directory}...")
+    last_report = time()
+    last_cpu = process_time()
+    last_rows = 0
+    while True:
+        try:
+            while True:
+                try:
+                    recorder.add(socket.recv(flags=zmq.NOBLOCK), time())
+                except zmq.Again:
+                    break
+
+            now = time()
+            if recorder.due(now):
+                recorder.flush()
+            if now - last_report >= report_interval:
+                cpu = process_time()
+                print(f"Recorded {recorder.rows - last_rows} rows ({(recorder.rows - last_rows) / (now - last_report):.0f}/s), "
+                      f"CPU {100 * (cpu - last_cpu) / (now - last_report):.1f}% of a core, "
+                      f"{recorder.dropped} frames without a schema")
+                last_report, last_cpu, last_rows = now, cpu, recorder.rows
+            sleep(drain_interval)
+        except KeyboardInterrupt:
+            print("Stopping recorder.")
+            break
+        except Exception as e:
+            print(f"Error recording data: {e}")
+
+    recorder.flush()
+    recorder.writer.pending.put(None)
+    recorder.writer.join()
+
+
+# Read a recording's sparse index
+def read_index(path):
+    return pd.read_csv(os.path.join(recording_directory(path), INDEX_FILE))
+
+
+# Load one segment as (DataFrame of its fields, receive times, binary)
+def read_segment(path):
+    with np.load(path) as segment:
+        schema = TelemetrySchema.from_description(segment["schema"].tobytes())
+        recv_time = segment["recv_time"]
+        columns = {}
+        for j, kind in enumerate(schema.kinds):
+            values = segment[f"c{j}"]
+            columns[j] = np.char.decode(values, 'utf-8') if kind.startswith('|S') else values
+        binary = bool(segment["binary"])
+    data_df = pd.DataFrame(columns)
+    data_df.columns = schema.columns
+    return data_df, recv_time, binary
+
+
+# Yield (DataFrame, receive times) for the rows of a recording between two
+# receive times, opening only the segments the sparse index says overlap
+def read_recording(path, start_time=None, end_time=None):
+    directory = recording_directory(path)
+    index = read_index(directory)
+    spans = index.groupby("segment", sort=False)["recv_time"].agg(["min", "max"])
+    for name, span in spans.iterrows():
+        if start_time is not None and span["max"] < start_time:
+            continue
+        if end_time is not None and span["min"] > end_time:
+            break
+        data_df, recv_time, _ = read_segment(os.path.join(directory, name))
+        first = np.searchsorted(recv_time, start_time, side='left') if start_time is not None else 0
+        last = np.searchsorted(recv_time, end_time, side='right') if end_time is not None else len(recv_time)
+        if last > first:
+            yield data_df.iloc[first:last].reset_index(drop=True), recv_time[first:last]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the telemetry bus into compressed columnar segments")
+    parser.add_argument("--port", default="tcp://localhost:1137")
+    parser.add_argument("--out", default="recordings", help="directory for the segments and index.csv")
+    parser.add_argument("--header", help="flight CSV whose header names the fields of text messages")
+    parser.add_argument("--segment-rows", type=int, default=100000, help="rows per segment file")
+    parser.add_argument("--segment-seconds", type=float, default=60.0,
+                        help="maximum seconds of data per segment file")
+    parser.add_argument("--index-interval", type=int, default=1000, help="rows between sparse index entries")
+    parser.add_argument("--drain-interval", type=float, default=0.05,
+                        help="seconds to sleep between draining the socket")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    header = read_header(args.header) + ["unix_time"] if args.header else None
+    writer = SegmentWriter(args.out, header, args.index_interval)
+    writer.start()
+    record(args.port, Recorder(writer, args.segment_rows, args.segment_seconds), args.drain_interval)
@@ -0,0 +1,634 @@
+import argparse
+import json
+import os
+import threading
+from time import monotonic, sleep
+
+import numpy as np
+import pandas as pd
+import zmq
+
+from telemetry import FRAME_MAGIC, HEADER, TelemetrySchema, FramePublisher
+from recorder import is_recording, read_recording
+
+
+# Seconds since the epoch for a datetime column, the same as int(x.timestamp())
+def unix_seconds(times):
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    return times.to_numpy().astype('datetime64[s]').astype(np.int64)
+
+
+# Use GPS Date & Time as the timestamp of a chunk of flight rows
+def prepare_flight(data_df):
+    data_df["GPS Date & Time"] = pd.to_datetime(data_df["GPS Date & Time"], errors='coerce')
+    data_df = data_df.dropna(subset=["GPS Date & Time"])
+    data_df["unix_time"] = unix_seconds(data_df["GPS Date & Time"])
+    return data_df
+
+
+# The columnar cache of a flight CSV, next to the CSV: one directory per
+# chunk as read, holding one .npy file per column
+def cache_path(file_path):
+    return f"{file_path}.npychunks"
+
+
+def cache_is_fresh(file_path):
+    index_path = os.path.join(cache_path(file_path), "columns.json")
+    try:
+        return os.path.getmtime(index_path) >= os.path.getmtime(file_path)
+    except OSError:
+        return False
+
+
+class CacheWriter:
+    """Write a flight's columnar cache one chunk at a time, so the whole
+    flight never has to be held in memory"""
+
+    def __init__(self, file_path):
+        self.directory = cache_path(file_path)
+        self.chunks = 0
+        self.columns = None
+        os.makedirs(self.directory, exist_ok=True)
+        # A cache being rewritten is stale until close() indexes it again
+        index_path = os.path.join(self.directory, "columns.json")
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    def write(self, data_df):
+        chunk_directory = os.path.join(self.directory, f"chunk_{self.chunks}")
+        os.makedirs(chunk_directory, exist_ok=True)
+        for i, col in enumerate(data_df.columns):
+            values = data_df[col].to_numpy()
+            if values.dtype == object:
+                values = values.astype(str)
+            np.save(os.path.join(chunk_directory, f"col_{i}.npy"), values)
+        self.columns = list(data_df.columns)
+        self.chunks += 1
+
+    def close(self):
+        # Written last, so a cache interrupted mid-write is never seen as fresh
+        with open(os.path.join(self.directory, "columns.json"), "w") as index_file:
+            json.dump({"columns": self.columns, "chunks": self.chunks}, index_file)
+
+
+# Yield a cached flight in chunks, straight from the memory-mapped columns
+def read_cache(file_path, chunksize):
+    directory = cache_path(file_path)
+    with open(os.path.join(directory, "columns.json")) as index_file:
+        index = json.load(index_file)
+    columns = index["columns"]
+    for chunk in range(index["chunks"]):
+        chunk_directory = os.path.join(directory, f"chunk_{chunk}")
+        arrays = [np.load(os.path.join(chunk_directory, f"col_{i}.npy"), mmap_mode='r')
+                  for i in range(len(columns))]
+        rows = len(arrays[0]) if arrays else 0
+        for start in range(0, rows, chunksize):
+            yield pd.DataFrame({col: np.asarray(values[start:start + chunksize])
+                                for col, values in zip(columns, arrays)})
+
+
+# Yield a flight log in prepared chunks, from the columnar cache when it is
+# up to date. With cache=True a full CSV read also writes the cache, chunk
+# by chunk as it goes; if the cache cannot be written (a read-only or full
+# location) the read carries on without it.
+def read_flight(file_path, chunksize=100000, cache=False):
+    if cache and cache_is_fresh(file_path):
+        yield from read_cache(file_path, chunksize)
+        return
+
+    writer = None
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        chunk = prepare_flight(chunk)
+        if cache:
+            try:
+                if writer is None:
+                    writer = CacheWriter(file_path)
+                writer.write(chunk)
+            except OSError as e:
+                print(f"Not caching {file_path}: {e}")
+                cache, writer = False, None
+        yield chunk
+    if writer is not None:
+        try:
+            writer.close()
+        except OSError as e:
+            print(f"Not caching {file_path}: {e}")
+
+
+# Load a whole flight log, using GPS Date & Time as the timestamp
+def load_flight(file_path, chunksize=100000, cache=False):
+    return pd.concat(list(read_flight(file_path, chunksize, cache)), ignore_index=True)
+
+
+class EncodedFlight:
+    """A flight log encoded once into a contiguous buffer of bus messages.
+
+    offsets[i]:offsets[i + 1] delimits the ready-to-send message for row i,
+    so seeking is an index lookup and sending a row is a single memoryview
+    slice of the buffer.
+    """
+
+    complete = True
+    loading = False
+
+    def __init__(self, buffer, offsets, unix_time, schema=None, binary=False):
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.offsets = offsets
+        self.unix_time = unix_time
+        self.schema = schema
+        self.binary = binary
+
+    @classmethod
+    def encode(cls, data_df, binary=False, schema=None, unix_time=None):
+        """Encode every row of a loaded flight as text messages or binary frames.
+        Rows are scheduled by the unix_time column unless times are passed in."""
+        if schema is None:
+            schema = TelemetrySchema.from_dataframe(data_df)
+        if binary:
+            records = schema.to_records(data_df)
+            frame_size = HEADER.size + records.dtype.itemsize
+            frames = np.empty((len(records), frame_size), dtype=np.uint8)
+            frames[:, :HEADER.size] = np.frombuffer(HEADER.pack(FRAME_MAGIC, schema.id), dtype=np.uint8)
+            frames[:, HEADER.size:] = records.view(np.uint8).reshape(len(records), -1)
+            buffer = frames.tobytes()
+            offsets = np.arange(len(records) + 1, dtype=np.int64) * frame_size
+        else:
+            # Same text as joining str() of every field of the row
+            columns = [list(map(str, data_df[col].tolist())) for col in data_df.columns]
+            messages = ["|".join(fields).encode('utf-8') for fields in zip(*columns)]
+            buffer = b"".join(messages)
+            offsets = np.zeros(len(messages) + 1, dtype=np.int64)
+            np.cumsum([len(message) for message in messages], out=offsets[1:])
+
+        if unix_time is not None:
+            unix_time = np.asarray(unix_time, dtype=np.float64)
+        elif "unix_time" in data_df.columns:
+            unix_time = data_df["unix_time"].to_numpy(dtype=np.float64)
+        else:
+            unix_time = np.zeros(len(data_df), dtype=np.float64)
+        return cls(buffer, offsets, unix_time, schema, binary)
+
+    def save(self, file_path):
+        """Write the encoded flight to an .npz capture for later replay"""
+        np.savez(file_path, buffer=np.frombuffer(self.buffer, dtype=np.uint8), offsets=self.offsets,
+                 unix_time=self.unix_time, schema=np.frombuffer(self.schema.description, dtype=np.uint8),
+                 binary=self.binary)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as capture:
+            schema = TelemetrySchema.from_description(capture["schema"].tobytes())
+            return cls(capture["buffer"].tobytes(), capture["offsets"], capture["unix_time"],
+                       schema, bool(capture["binary"]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return len(self.buffer)
+
+    def frame(self, index):
+        """Message for one row, as a zero-copy slice of the buffer"""
+        return self.view[self.offsets[index]:self.offsets[index + 1]]
+
+    def batch(self, start, stop):
+        """Messages for rows start:stop. Binary rows are merged into a single
+        multi-row frame; text rows stay one message each."""
+        if not self.binary:
+            return [self.frame(index) for index in range(start, stop)]
+        if stop - start == 1:
+            return [self.frame(start)]
+        frame_size = int(self.offsets[1])
+        frames = np.frombuffer(self.buffer, dtype=np.uint8).reshape(len(self), frame_size)
+        return [HEADER.pack(FRAME_MAGIC, self.schema.id) + frames[start:stop, HEADER.size:].tobytes()]
+
+    def schemas(self, start, stop):
+        """Schemas of the frames for rows start:stop, in order"""
+        return [self.schema]
+
+
+class StreamingFlight:
+    """A flight encoded chunk by chunk, playable while it is still loading.
+
+    Each appended chunk becomes an EncodedFlight segment; rows are addressed
+    across segments by their global index. The binary schema is widened
+    whenever a chunk has longer text, or text in a column that was numeric
+    so far; a chunk with other columns, such as the next segment of a
+    recording whose layout changed, starts a fresh schema. Earlier segments
+    keep the schema they were encoded with, and `columns` stays that of the
+    first chunk. `loading` is cleared when the loader is done, and
+    `complete` is only set when every row was loaded.
+    """
+
+    def __init__(self, binary=False):
+        self.binary = binary
+        self.schema = None
+        self.columns = []
+        self.segments = []
+        self.starts = np.zeros(1, dtype=np.int64)
+        self.complete = False
+        self.loading = True
+        self._times = np.zeros(0, dtype=np.float64)
+        self._rows = 0
+
+    def append(self, data_df, unix_time=None):
+        schema = self.schema
+        if schema is not None and list(data_df.columns) != schema.columns:
+            schema = None
+        elif self.binary and schema is not None:
+            schema = schema.widen(data_df)
+        segment = EncodedFlight.encode(data_df, binary=self.binary, schema=schema, unix_time=unix_time)
+        if self.schema is None:
+            self.columns = list(data_df.columns)
+        self.schema = segment.schema
+        rows = self._rows + len(segment)
+        if rows > len(self._times):
+            times = np.empty(max(rows, 2 * len(self._times)), dtype=np.float64)
+            times[:self._rows] = self._times[:self._rows]
+            self._times = times
+        self._times[self._rows:rows] = segment.unix_time
+        self.segments.append(segment)
+        self.starts = np.append(self.starts, rows)
+        # Published last: readers on other threads only see complete rows
+        self._rows = rows
+
+    @property
+    def unix_time(self):
+        return self._times[:self._rows]
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def nbytes(self):
+        return sum(segment.nbytes for segment in self.segments)
+
+    def merged(self):
+        """The whole flight as one EncodedFlight, e.g. to save it. Binary
+        flights must have a single schema throughout."""
+        schemas = {segment.schema.id for segment in self.segments}
+        if self.binary and len(schemas) > 1:
+            raise ValueError(f"Flight has {len(schemas)} binary layouts; save it as text instead")
+        buffer = b"".join(segment.buffer for segment in self.segments)
+        sizes = np.concatenate([np.diff(segment.offsets) for segment in self.segments] or [np.zeros(0, np.int64)])
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        return EncodedFlight(buffer, offsets, self.unix_time.copy(), self.schema, self.binary)
+
+    def _segment(self, index):
+        return int(np.searchsorted(self.starts, index, side='right')) - 1
+
+    def frame(self, index):
+        s = self._segment(index)
+        return self.segments[s].frame(index - self.starts[s])
+
+    def batch(self, start, stop):
+        messages = []
+        s = self._segment(start)
+        while start < stop:
+            end = min(stop, int(self.starts[s + 1]))
+            messages.extend(self.segments[s].batch(start - self.starts[s], end - self.starts[s]))
+            start = end
+            s += 1
+        return messages
+
+    def schemas(self, start, stop):
+        schemas = []
+        for segment in self.segments[self._segment(start):self._segment(max(stop - 1, start)) + 1]:
+            if not schemas or schemas[-1] is not segment.schema:
+                schemas.append(segment.schema)
+        return schemas
+
+
+class FlightLoader(threading.Thread):
+    """Read a flight log into a StreamingFlight on a background thread.
+
+    `ready` is set once the first chunk is encoded (or loading has ended),
+    so playback can start long before a large log is fully read. The path
+    may also be a bus recording, replayed at its receive times between
+    start_time and end_time. A load that fails leaves the flight
+    incomplete, with the exception in `error`.
+    """
+
+    def __init__(self, file_path, binary=False, chunksize=100000, cache=False, start_time=None, end_time=None):
+        super().__init__(daemon=True)
+        self.file_path = file_path
+        self.chunksize = chunksize
+        self.cache = cache
+        self.start_time = start_time
+        self.end_time = end_time
+        self.flight = StreamingFlight(binary)
+        self.ready = threading.Event()
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            if is_recording(self.file_path):
+                chunks = read_recording(self.file_path, self.start_time, self.end_time)
+            else:
+                chunks = ((chunk, None) for chunk in read_flight(self.file_path, self.chunksize, self.cache))
+            for chunk, unix_time in chunks:
+                if self._stop_event.is_set():
+                    return
+                self.flight.append(chunk, unix_time)
+                self.ready.set()
+            self.flight.complete = True
+        except Exception as e:
+            self.error = e
+            print(f"Error loading flight: {e}")
+        finally:
+            self.flight.loading = False
+            self.ready.set()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class ReplayStats:
+    """Lag of every sent row behind its scheduled time, in seconds.
+
+    Jitter is the standard deviation of the lag: a constant lag shifts the
+    whole replay, a varying one distorts the spacing between rows.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rows = 0
+        self.batches = 0
+        self.max_lag = 0.0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def add(self, lags):
+        self.rows += len(lags)
+        self.batches += 1
+        self.max_lag = max(self.max_lag, float(lags.max()))
+        self._sum += float(lags.sum())
+        self._sum_sq += float(np.square(lags).sum())
+
+    @property
+    def mean_lag(self):
+        return self._sum / self.rows if self.rows else 0.0
+
+    @property
+    def jitter(self):
+        if not self.rows:
+            return 0.0
+        return float(np.sqrt(max(self._sum_sq / self.rows - self.mean_lag ** 2, 0.0)))
+
+    def summary(self):
+        return (f"{self.rows} rows in {self.batches} batches, "
+                f"lag mean {self.mean_lag * 1000:.1f} ms, max {self.max_lag * 1000:.1f} ms, "
+                f"jitter {self.jitter * 1000:.1f} ms")
+
+
+class ReplayScheduler(threading.Thread):
+    """Replay an EncodedFlight or StreamingFlight against its recorded timestamps.
+
+    Row i is due (unix_time[i] - unix_time[start]) / speed seconds after
+    playback started at row `start`, measured on the monotonic clock. Each
+    wake-up sends every row that has come due, so rows sharing a timestamp
+    go out together. Runs on its own thread; play, pause, seek and
+    set_speed may be called from any other thread. Rows appended to a
+    StreamingFlight are picked up as they arrive.
+    """
+
+    def __init__(self, flight=None, publisher=None, speed=1.0):
+        super().__init__(daemon=True)
+        self.speed = speed
+        self.position = 0
+        self.playing = False
+        self.stats = ReplayStats()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._sending = False
+        self._anchor_clock = 0.0
+        self._anchor_time = 0.0
+        self.load(flight, publisher)
+
+    def load(self, flight, publisher):
+        """Replace the flight being played, keeping the position"""
+        with self._cond:
+            self.flight = flight
+            self.publisher = publisher
+            self._times = np.zeros(0)
+            self._sync_times()
+            self.position = min(self.position, len(self._times))
+            self._anchor()
+            self._cond.notify_all()
+
+    def _sync_times(self):
+        # Extend the schedule with rows loaded since the last call. Timestamps
+        # that step backwards are sent as soon as they are reached.
+        loaded = len(self.flight) if self.flight is not None else 0
+        scheduled = len(self._times)
+        if loaded <= scheduled:
+            return
+        times = self.flight.unix_time[scheduled:loaded]
+        if scheduled:
+            times = np.maximum(times, self._times[-1])
+        self._times = np.concatenate([self._times, np.maximum.accumulate(times)])
+        # Playback caught up with loading; resume the schedule from here
+        if self.position == scheduled:
+            self._anchor()
+
+    def _anchor(self):
+        # Restart the schedule from the current row at the current time
+        self._anchor_clock = monotonic()
+        if self.position < len(self._times):
+            self._anchor_time = self._times[self.position]
+
+    @property
+    def finished(self):
+        # Every row is scheduled and the last batch has gone out
+        loading = self.flight is not None and self.flight.loading
+        return not loading and self.position >= len(self._times) and not self._sending
+
+    def wait(self, timeout=None):
+        """Block until the flight has been sent or `timeout` seconds pass;
+        return whether it finished"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.finished, timeout)
+
+    def play(self):
+        with self._cond:
+            self.playing = True
+            self.stats.reset()
+            self._anchor()
+            self._cond.notify_all()
+
+    def pause(self):
+        with self._cond:
+            self.playing = False
+
+    def seek(self, position):
+        with self._cond:
+            self._sync_times()
+            self.position = max(0, min(int(position), len(self._times)))
+            self._anchor()
+            self._cond.notify_all()
+
+    def set_speed(self, speed):
+        with self._cond:
+            self.speed = speed
+            self._anchor()
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._sync_times()
+                if not self.playing or self.finished:
+                    self.playing = False
+                    self._cond.wait()
+                    continue
+                if self.position >= len(self._times):
+                    # Waiting for the loader to encode more rows
+                    self._cond.wait(0.05)
+                    continue
+                now = monotonic()
+                elapsed = (now - self._anchor_clock) * self.speed
+                start = self.position
+                stop = int(np.searchsorted(self._times, self._anchor_time + elapsed, side='right'))
+                if stop <= start:
+                    # Sleep until the next row is due, or until woken by a control call
+                    self._cond.wait((self._times[start] - self._anchor_time - elapsed) / self.speed)
+                    continue
+                self.position = stop
+                self._sending = True
+                flight, publisher = self.flight, self.publisher
+                due = self._anchor_clock + (self._times[start:stop] - self._anchor_time) / self.speed
+
+            if flight.binary:
+                for schema in flight.schemas(start, stop):
+                    publisher.use_schema(schema)
+            for message in flight.batch(start, stop):
+                publisher.socket.send(message, copy=False)
+            lags = monotonic() - due
+            with self._cond:
+                self.stats.add(lags)
+                self._sending = False
+                self._cond.notify_all()
+
+
+# Send every row once, as fast as possible or at a fixed number of messages
+# per second. Returns the number of messages sent.
+def stream_flight(flight, publisher, rate=0.0, report_interval=1.0):
+    socket = publisher.socket
+    start = last_report = monotonic()
+    reported = 0
+    for index in range(len(flight)):
+        if flight.binary:
+            for schema in flight.schemas(index, index + 1):
+                publisher.use_schema(schema)
+        if rate > 0:
+            ahead = start + index / rate - monotonic()
+            if ahead > 0:
+                sleep(ahead)
+        socket.send(flight.frame(index), copy=False)
+
+        now = monotonic()
+        if now - last_report >= report_interval:
+            print(f"{index + 1}/{len(flight)} messages, {(index + 1 - reported) / (now - last_report):.0f} msgs/s")
+            last_report, reported = now, index + 1
+
+    elapsed = monotonic() - start
+    print(f"Sent {len(flight)} messages in {elapsed:.2f} s ({len(flight) / max(elapsed, 1e-9):.0f} msgs/s)")
+    return len(flight)
+
+
+# Replay at the recorded timestamps, scaled by speed
+def replay_flight(flight, publisher, speed, report_interval=1.0):
+    scheduler = ReplayScheduler(flight, publisher, speed=speed)
+    scheduler.start()
+    start = monotonic()
+    scheduler.play()
+    # Woken as soon as the last batch is sent, so the rate isn't diluted by
+    # the rest of a report interval
+    while not scheduler.wait(report_interval):
+        print(f"{scheduler.position}/{len(flight)} messages, {scheduler.stats.summary()}")
+    elapsed = monotonic() - start
+    scheduler.close()
+    print(f"Sent {len(flight)} messages in {elapsed:.2f} s ({len(flight) / max(elapsed, 1e-9):.0f} msgs/s)")
+    return len(flight)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a flight log onto the bus without the player window")
+    parser.add_argument("file", help="flight CSV, an .npz capture written with --save, or a recording directory")
+    parser.add_argument("--port", default="tcp://127.0.0.1:1137")
+    parser.add_argument("--binary", action="store_true",
+                        help="publish binary telemetry frames instead of pipe-delimited text (CSV input only)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="target messages per second (0 sends as fast as possible)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="replay at the recorded GPS timestamps times this factor instead of --rate")
+    parser.add_argument("--loops", type=int, default=1, help="number of times to send the flight")
+    parser.add_argument("--warmup", type=float, default=1.0,
+                        help="seconds to wait after binding so subscribers can connect")
+    parser.add_argument("--hwm", type=int, default=100000,
+                        help="send high-water mark; messages beyond it are dropped by the PUB socket")
+    parser.add_argument("--save", help="write the encoded flight to this .npz capture and exit")
+    parser.add_argument("--cache", action="store_true",
+                        help="read the CSV from its columnar .npy cache, writing the cache on first use")
+    parser.add_argument("--chunksize", type=int, default=100000, help="rows per chunk when reading the CSV")
+    parser.add_argument("--start", type=float, help="first receive time (unix seconds) to replay from a recording")
+    parser.add_argument("--end", type=float, help="last receive time (unix seconds) to replay from a recording")
+    args = parser.parse_args()
+
+    if args.file.endswith(".npz"):
+        flight = EncodedFlight.load(args.file)
+    elif is_recording(args.file):
+        # Recorded rows are scheduled by the time they were received from the
+        # bus. Each segment is encoded with its own columns, so a recording
+        # whose layout changed replays every row as it was recorded.
+        flight = StreamingFlight(args.binary)
+        for data_df, recv_time in read_recording(args.file, args.start, args.end):
+            flight.append(data_df, recv_time)
+        flight.complete, flight.loading = True, False
+    else:
+        flight = EncodedFlight.encode(load_flight(args.file, args.chunksize, args.cache), binary=args.binary)
+    print(f"Loaded {len(flight)} rows ({'binary' if flight.binary else 'text'}, {flight.nbytes} bytes)")
+
+    if args.save:
+        if isinstance(flight, StreamingFlight):
+            try:
+                flight = flight.merged()
+            except ValueError as e:
+                parser.error(str(e))
+        flight.save(args.save)
+        print(f"Saved capture to {args.save}")
+    else:
+        context = zmq.Context()
+        socket = context.socket(zmq.PUB)
+        socket.setsockopt(zmq.SNDHWM, args.hwm)
+        socket.bind(args.port)
+        sleep(args.warmup)
+        publisher = FramePublisher(socket, flight.schema, binary=flight.binary)
+        if flight.binary:
+            publisher.announce(force=True)
+
+        try:
+            for _ in range(args.loops):
+                if args.speed > 0:
+                    replay_flight(flight, publisher, args.speed)
+                else:
+                    stream_flight(flight, publisher, args.rate)
+        except KeyboardInterrupt:
+            print("Stopped")
+        finally:
+            socket.close(linger=1000)
+            context.term()
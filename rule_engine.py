@@ -1,9 +1,20 @@
+import argparse
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import numpy as np
 import pandas as pd
 import zmq
-from durable.lang import ruleset, when_all, assert_fact, m
-from durable.engine import MessageNotHandledException
-from time import time
-rule_engine_name = 'dynamic_rules'+str(time())
+from time import time, monotonic
+from telemetry import FRAME_MAGIC, SCHEMA_MAGIC, BUS_LAYOUT, FieldDecoder, FrameDecoder, StreamLayout, recv_frame
+
+# Telemetry fields identifying the aircraft a message came from
+AIRCRAFT_FIELDS = ['identity', 'mode', 'phase']
+
+
 # Load the rules from a CSV file
 def load_rules(file_path):
     try:
@@ -15,69 +26,490 @@ def load_rules(file_path):
         return None
 
 
-# Create rules dynamically based on the CSV file
-def create_dynamic_rules(data):
+class CompiledRules:
+    """Rules table compiled into a (rules x fields) array of lower limits.
+
+    A rule matches a fact when every field is strictly greater than the
+    rule's limit for that field, the same test the durable ruleset used
+    (m.Altitude > limit & m.Speed > limit).
+    """
+
+    def __init__(self, names, fields, limits, sources=None):
+        self.names = list(names)
+        self.fields = list(fields)
+        self.limits = np.asarray(limits, dtype=np.float64).reshape(len(self.names), len(self.fields))
+        # Raw table cells each rule was compiled from, used to reuse
+        # unchanged rules when the table is reloaded
+        self.sources = list(sources) if sources is not None else [None] * len(self.names)
+
+        # Per-field index: each column of limits sorted ascending, the rules in
+        # that order, and every rule's rank within it. The rules satisfied on a
+        # field by value v are exactly the prefix of limits below v.
+        self.order = np.argsort(self.limits, axis=0, kind='stable')
+        self.sorted_limits = np.take_along_axis(self.limits, self.order, axis=0)
+        self.rank = np.empty_like(self.order)
+        np.put_along_axis(self.rank, self.order, np.arange(len(self.names))[:, np.newaxis], axis=0)
+
+    def __len__(self):
+        return len(self.names)
+
+    def evaluate(self, facts):
+        """Return an (n_facts x n_rules) boolean match matrix for a batch of facts"""
+        facts = np.asarray(facts, dtype=np.float64).reshape(-1, len(self.fields))
+        return (facts[:, np.newaxis, :] > self.limits[np.newaxis, :, :]).all(axis=2)
+
+    def prefix_lengths(self, facts):
+        """Binary-search every fact value into its field's sorted limits.
+
+        Returns an (n_facts x n_fields) array with the number of rules whose
+        limit on that field is below the fact value.
+        """
+        facts = np.asarray(facts, dtype=np.float64).reshape(-1, len(self.fields))
+        counts = np.empty(facts.shape, dtype=np.intp)
+        for f in range(len(self.fields)):
+            counts[:, f] = np.searchsorted(self.sorted_limits[:, f], facts[:, f], side='left')
+        # NaN sorts after every limit but never compares greater than one
+        counts[np.isnan(facts)] = 0
+        return counts
+
+    def match_indices(self, counts):
+        """Rule indices matched by one fact, given its row of prefix_lengths.
+
+        Candidates come from the field with the fewest satisfied rules and are
+        intersected with the other fields by rank, so the cost grows with the
+        number of near-matching rules rather than the size of the table.
+        """
+        if not self.fields:
+            return np.arange(len(self.names))
+        f = int(np.argmin(counts))
+        candidates = self.order[:counts[f], f]
+        if len(candidates) == 0:
+            return candidates
+        keep = (self.rank[candidates] < counts).all(axis=1)
+        return np.sort(candidates[keep])
+
+    def matched_names(self, facts):
+        """Yield the list of matched rule names for each fact in the batch"""
+        for counts in self.prefix_lengths(facts):
+            yield [self.names[r] for r in self.match_indices(counts)]
+
+    def matches(self, facts):
+        """Yield (fact_index, rule_name) for every rule matched by the batch"""
+        for fact_index, names in enumerate(self.matched_names(facts)):
+            for rule_name in names:
+                yield fact_index, rule_name
+
+
+# Compile the rules table into threshold arrays. When the previously
+# compiled rules are passed in, rules whose row is unchanged are reused and
+# only new or edited rows are parsed and reported.
+def compile_rules(data, previous=None, layout=BUS_LAYOUT):
     if data is None:
         print("No rules data available. Exiting rule creation.")
-        return
+        return None
 
-    # Initialize ZMQ publisher
+    # A <Field>_Limit column tests the field of the same name in the stream
+    fields = [col[:-len('_Limit')] for col in data.columns
+              if col.endswith('_Limit') and col[:-len('_Limit')].lower() in layout.positions]
+    compiled = {}
+    if previous is not None and previous.fields == fields:
+        compiled = {source: limits for source, limits in zip(previous.sources, previous.limits.tolist())}
+
+    names = []
+    limits = []
+    sources = []
+    changed = 0
+    for index, row in data.iterrows():
+        rule_name = row.get('Rule_Name', f"Rule {index}")
+        source = (rule_name,) + tuple(str(row[f"{field}_Limit"]) for field in fields)
+        rule_limits = compiled.get(source)
+        if rule_limits is None:
+            try:
+                rule_limits = [int(row[f"{field}_Limit"]) for field in fields]
+            except ValueError as ve:
+                print(f"Error processing rule {rule_name}: {ve}")
+                continue
+
+            print(f"Registering {rule_name}: " +
+                  ", ".join(f"{field} > {limit}" for field, limit in zip(fields, rule_limits)))
+            changed += 1
+        names.append(rule_name)
+        limits.append(rule_limits)
+        sources.append(source)
+
+    if previous is not None:
+        print(f"Rules reloaded: {changed} new or changed, {len(names) - changed} unchanged, "
+              f"{len(set(previous.sources) - set(sources))} removed")
+    return CompiledRules(names, fields, limits, sources)
+
+
+class RulesWatcher(threading.Thread):
+    """Background thread that recompiles the rules file whenever it changes.
+
+    The ingest loop reads `rules` once per batch; a reload builds a new
+    CompiledRules off the hot path and swaps it in with a single reference
+    assignment, so in-flight batches always see a consistent rule set.
+    """
+
+    def __init__(self, file_path, rules, interval=1.0, layout=BUS_LAYOUT):
+        super().__init__(daemon=True)
+        self.file_path = file_path
+        self.rules = rules
+        self.interval = interval
+        self.layout = layout
+        self._stamp = self._file_stamp()
+        self._stop_event = threading.Event()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.file_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            stamp = self._file_stamp()
+            if stamp is None or stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            rules = compile_rules(load_rules(self.file_path), previous=self.rules, layout=self.layout)
+            # Keep the current rules if the file was unreadable mid-write
+            if rules is not None:
+                self.rules = rules
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class AlertState:
+    """Hysteresis state of one rule for one aircraft"""
+
+    def __init__(self):
+        self.active = False
+        self.hits = 0           # consecutive matching facts
+        self.misses = 0         # consecutive non-matching facts
+        self.suppressed = 0     # matches since the last message was sent
+        self.last_sent = None
+
+
+class AlertTracker:
+    """Turn per-fact rule matches into a few alert state transitions.
+
+    A (rule, aircraft) pair raises an alert after `enter_count` consecutive
+    matching facts and clears after `exit_count` consecutive non-matching
+    ones. While an alert stays active, a reminder carrying the number of
+    coalesced matches is sent at most once per `realert_interval` seconds.
+    """
+
+    def __init__(self, enter_count=2, exit_count=5, realert_interval=30.0):
+        self.enter_count = enter_count
+        self.exit_count = exit_count
+        self.realert_interval = realert_interval
+        self.states = {}  # aircraft -> {rule_name: AlertState}
+
+    def update(self, aircraft, matched, now):
+        """Feed the rules matched by one fact and return the messages to publish"""
+        messages = []
+        states = self.states.setdefault(aircraft, {})
+
+        for rule_name in matched:
+            state = states.get(rule_name)
+            if state is None:
+                state = states[rule_name] = AlertState()
+            state.hits += 1
+            state.misses = 0
+            state.suppressed += 1
+            if not state.active:
+                if state.hits >= self.enter_count:
+                    state.active = True
+                    state.last_sent = now
+                    state.suppressed = 0
+                    messages.append(f"Alert: {rule_name} matched on {aircraft}.")
+            elif now - state.last_sent >= self.realert_interval:
+                messages.append(f"Alert: {rule_name} still active on {aircraft} "
+                                f"({state.suppressed} matches since last alert).")
+                state.last_sent = now
+                state.suppressed = 0
+
+        for rule_name in [name for name in states if name not in matched]:
+            state = states[rule_name]
+            state.hits = 0
+            state.misses += 1
+            if not state.active:
+                del states[rule_name]
+            elif state.misses >= self.exit_count:
+                messages.append(f"Cleared: {rule_name} on {aircraft}.")
+                del states[rule_name]
+
+        if not states:
+            del self.states[aircraft]
+        return messages
+
+    def active_count(self):
+        return sum(state.active for states in self.states.values() for state in states.values())
+
+
+# Decoder for the aircraft identity followed by the rule fields. The current
+# decoder is reused unless a reload changed the rule fields.
+def fact_decoder(fields, frames, current=None, layout=BUS_LAYOUT):
+    wanted = AIRCRAFT_FIELDS + [field.lower() for field in fields]
+    if current is not None and current.fields == wanted:
+        return current
+    return FieldDecoder(wanted, frames=frames, layout=layout)
+
+
+# Aircraft identities from the decoded identity columns of a binary frame
+def column_aircraft(columns):
+    return ["/".join(ids) for ids in zip(*(column.tolist() for column in columns))]
+
+
+def ring_hash(key):
+    # Stable across processes, unlike the salted built-in hash()
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent-hash ring assigning aircraft identities to worker shards.
+
+    Each shard owns `replicas` points on the ring so aircraft spread evenly,
+    and resizing the pool only moves the aircraft whose nearest point moved.
+    Assignments are cached for up to `cache_size` identities; the cache
+    starts over when it fills, so it stays bounded however many aircraft
+    pass through.
+    """
+
+    def __init__(self, shards, replicas=64, cache_size=65536):
+        points = sorted((ring_hash(f"shard-{shard}-{i}"), shard)
+                        for shard in range(shards) for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+        self.cache_size = cache_size
+        self._assigned = {}
+
+    def shard_for(self, key):
+        shard = self._assigned.get(key)
+        if shard is None:
+            i = bisect.bisect(self._hashes, ring_hash(key)) % len(self._hashes)
+            shard = self._shards[i]
+            if len(self._assigned) >= self.cache_size:
+                self._assigned.clear()
+            self._assigned[key] = shard
+        return shard
+
+
+# Listen for data on a ZMQ port and evaluate against rules. `rules` is either
+# a CompiledRules or a RulesWatcher holding the current rules.
+def evaluate_data(zmq_port, rules, tracker, layout=BUS_LAYOUT):
+    watcher = rules if isinstance(rules, RulesWatcher) else None
+    frames = FrameDecoder()
+    decoder = None
     context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.connect(zmq_port)
+    socket.setsockopt_string(zmq.SUBSCRIBE, '')  # Subscribe to all messages
+
+    # Initialize ZMQ publisher
     pub_socket = context.socket(zmq.PUB)
     pub_socket.bind("tcp://*:5556")  # Replace with appropriate port
 
-    # Ensure ruleset exists
-    with ruleset(rule_engine_name):
-        for index, row in data.iterrows():
-            try:
-                rule_name = row['Rule_Name']
-                altitude_limit = int(row['Altitude_Limit'])
-                speed_limit = int(row['Speed_Limit'])
+    print("Listening for real-time data on ZMQ port...")
 
-                print(f"Registering {rule_name}: Altitude <= {altitude_limit}, Speed <= {speed_limit}")
+    while True:
+        try:
+            message = recv_frame(socket)
+            if watcher is not None:
+                rules = watcher.rules
+            decoder = fact_decoder(rules.fields, frames, decoder, layout)
+            system_time = int(time())
+            for row_data in decoder.decode(message):
+                aircraft = "/".join(row_data[:len(AIRCRAFT_FIELDS)])
+                values = list(row_data[len(AIRCRAFT_FIELDS):])
+                # Normalize fields and add timestamp
+                data = {'Timestamp': system_time, 'Aircraft': aircraft, **dict(zip(rules.fields, values))}
+                print(f"Received data: {data}")
 
-                @when_all(
-                    (m.Altitude > altitude_limit) & (m.Speed > speed_limit)
-                )
-                def dynamic_rule(c):
-                    alert_message = f"Alert: {rule_name} matched."
+                matched = next(rules.matched_names([values]))
+                if not matched:
+                    print(f"No rule matched for data: {data}")
+                for alert_message in tracker.update(aircraft, matched, monotonic()):
                     print(alert_message)
                     pub_socket.send_string(alert_message)
 
-            except ValueError as ve:
-                print(f"Error processing rule {rule_name}: {ve}")
+        except KeyboardInterrupt:
+            print("Stopping ZMQ listener.")
+            break
+        except Exception as e:
+            print(f"Error receiving data: {e}")
+
+
+# Receive whatever is already queued on the socket, up to limit messages
+def drain(socket, messages, limit):
+    while len(messages) < limit:
+        try:
+            messages.append(recv_frame(socket, flags=zmq.NOBLOCK))
+        except zmq.Again:
+            break
+
+
+# Receive a micro-batch: block for the first message, drain the queue, then
+# keep polling until the batch is full or the window closes. Returns the
+# messages and how many were already queued when the drain started.
+def receive_batch(socket, poller, batch_size, batch_window, idle_timeout=None):
+    messages = []
+    if not poller.poll(idle_timeout):
+        return messages, 0
+
+    drain(socket, messages, batch_size)
+    queued = len(messages)
+
+    deadline = monotonic() + batch_window
+    while len(messages) < batch_size:
+        remaining = deadline - monotonic()
+        if remaining <= 0 or not poller.poll(remaining * 1000):
+            break
+        drain(socket, messages, batch_size)
+    return messages, queued
+
+
+# Parse a batch of messages into aircraft identities and an (n x fields)
+# fact array, skipping messages that are too short or not numeric. Messages
+# are raw text or binary frames, or (schema, records) pairs decoded upstream.
+def parse_batch(messages, decoder):
+    n_ids = len(AIRCRAFT_FIELDS)
+    n_fields = len(decoder.fields) - n_ids
+    aircraft = []
+    blocks = []
+    text_facts = []
+    rejected = 0
+    for message in messages:
+        try:
+            row_data, columns = decoder.decode_columns(message)
+        except (IndexError, ValueError):
+            rejected += 1
+            continue
+        if row_data is not None:
+            aircraft.append("/".join(row_data[:n_ids]))
+            text_facts.append(row_data[n_ids:])
+            continue
+        if not columns:
+            continue
+        # Keep facts in arrival order across text and binary messages
+        if text_facts:
+            blocks.append(np.array(text_facts, dtype=np.float64).reshape(-1, n_fields))
+            text_facts = []
+        aircraft.extend(column_aircraft(columns[:n_ids]))
+        blocks.append(np.column_stack(columns[n_ids:]) if n_fields else np.empty((len(columns[0]), 0)))
+    if text_facts:
+        blocks.append(np.array(text_facts, dtype=np.float64).reshape(-1, n_fields))
+    if not blocks:
+        return aircraft, np.empty((0, n_fields), dtype=np.float64), rejected
+    return aircraft, np.concatenate(blocks), rejected
+
+
+# Number of rows in a shard's slice of a batch
+def row_count(messages):
+    return sum(len(message[1]) if isinstance(message, tuple) else 1 for message in messages)
+
+
+# Split a batch between worker shards by aircraft. Text messages are routed
+# whole; binary frames are decoded here so rows of different aircraft can be
+# sent to different shards as (schema, records) pairs.
+def route_batch(messages, ring, decoder, workers):
+    shards = [[] for _ in range(workers)]
+    for message in messages:
+        if bytes(message[:4]) in (FRAME_MAGIC, SCHEMA_MAGIC):
+            schema, records = decoder.frames.decode_frame(message)
+            if len(records) == 0:
+                continue
+            identities = column_aircraft(decoder.decode_records(schema, records))
+            shard_of = np.array([ring.shard_for(identity) for identity in identities])
+            for shard in np.unique(shard_of):
+                shards[shard].append((schema, records[shard_of == shard]))
+            continue
+        text = bytes(message).decode('utf-8')
+        try:
+            identity = "/".join(decoder.decode_text(text))
+        except IndexError:
+            identity = ""  # Malformed; the shard that gets it rejects it
+        shards[ring.shard_for(identity)].append(text)
+    return shards
+
+
+# Parse and evaluate one batch of messages, returning the alert messages to
+# publish with the number of rejected messages and rule matches
+def evaluate_batch(messages, rules, tracker, decoder):
+    aircraft, facts, rejected = parse_batch(messages, decoder)
+    now = monotonic()
+    alerts = []
+    matches = 0
+    for identity, matched in zip(aircraft, rules.matched_names(facts)):
+        matches += len(matched)
+        alerts.extend(tracker.update(identity, matched, now))
+    return alerts, rejected, matches
+
 
-# Listen for data on a ZMQ port and evaluate against rules
-def evaluate_data(zmq_port):
+# Worker process owning the alert state of the aircraft hashed to its shard.
+# The inbox carries ('rules', CompiledRules), ('batch', messages) or
+# ('stop', None); results go back to the ingest process through the outbox.
+def shard_worker(shard, inbox, outbox, tracker_args, layout=BUS_LAYOUT):
+    rules = None
+    tracker = AlertTracker(*tracker_args)
+    frames = FrameDecoder()
+    decoder = None
+    try:
+        while True:
+            kind, payload = inbox.get()
+            if kind == 'stop':
+                break
+            if kind == 'rules':
+                rules = payload
+                decoder = fact_decoder(rules.fields, frames, decoder, layout)
+                continue
+            alerts, rejected, matches = evaluate_batch(payload, rules, tracker, decoder)
+            outbox.put((shard, row_count(payload), rejected, matches, tracker.active_count(), alerts))
+    except KeyboardInterrupt:
+        pass
+
+
+# Drain the ZMQ port in micro-batches and evaluate each batch in one pass.
+# `rules` is either a CompiledRules or a RulesWatcher holding the current rules.
+def evaluate_batches(zmq_port, rules, tracker, batch_size=1000, batch_window=0.05, layout=BUS_LAYOUT):
+    watcher = rules if isinstance(rules, RulesWatcher) else None
+    frames = FrameDecoder()
+    decoder = None
     context = zmq.Context()
     socket = context.socket(zmq.SUB)
     socket.connect(zmq_port)
     socket.setsockopt_string(zmq.SUBSCRIBE, '')  # Subscribe to all messages
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
 
-    print("Listening for real-time data on ZMQ port...")
+    # Initialize ZMQ publisher
+    pub_socket = context.socket(zmq.PUB)
+    pub_socket.bind("tcp://*:5556")  # Replace with appropriate port
+
+    print(f"Listening for real-time data on ZMQ port (batch size {batch_size}, "
+          f"window {batch_window * 1000:.0f} ms)...")
 
     while True:
         try:
-            # Receive JSON data from ZMQ
-            message = socket.recv_string()
-            row_data = message.split("|")
-            system_time = int(time())
-            altitude = float(row_data[6])
-            speed = float(row_data[7])
-            # Normalize fields and add timestamp
-            data = {
-                'Timestamp': system_time,  # Add unique timestamp
-                'Altitude': altitude,
-                'Speed': speed
-            }
-            print(f"Received data: {data}")
+            messages, queued = receive_batch(socket, poller, batch_size, batch_window, idle_timeout=1000)
+            if not messages:
+                continue
+            # Pick up a reloaded rule set between batches
+            if watcher is not None:
+                rules = watcher.rules
+            decoder = fact_decoder(rules.fields, frames, decoder, layout)
+            alerts, rejected, matches = evaluate_batch(messages, rules, tracker, decoder)
+            for alert_message in alerts:
+                print(alert_message)
+                pub_socket.send_string(alert_message)
 
-            try:
-                assert_fact(rule_engine_name, data)
-            except MessageNotHandledException:
-                print(f"No rule matched for data: {data}")
-            except Exception as e:
-                print(f"Error processing data {data}: {e}")
+            print(f"Batch: {len(messages)} received, {rejected} rejected, "
+                  f"{matches} matches, {len(alerts)} alerts sent, {tracker.active_count()} active, "
+                  f"queue depth {queued}"
+                  + (" (batch full, falling behind)" if len(messages) >= batch_size else ""))
 
         except KeyboardInterrupt:
             print("Stopping ZMQ listener.")
@@ -86,17 +518,134 @@ def evaluate_data(zmq_port):
             print(f"Error receiving data: {e}")
 
 
+# Drain the ZMQ port in micro-batches and shard evaluation across worker
+# processes by aircraft, so each aircraft's alert state lives in one worker
+def evaluate_sharded(zmq_port, rules, tracker_args, workers, batch_size=1000, batch_window=0.05,
+                     layout=BUS_LAYOUT):
+    watcher = rules if isinstance(rules, RulesWatcher) else None
+    current_rules = watcher.rules if watcher is not None else rules
+
+    ring = HashRing(workers)
+    decoder = FieldDecoder(AIRCRAFT_FIELDS, layout=layout)
+    outbox = multiprocessing.Queue()
+    inboxes = []
+    processes = []
+    for shard in range(workers):
+        inbox = multiprocessing.Queue()
+        inbox.put(('rules', current_rules))
+        process = multiprocessing.Process(target=shard_worker, args=(shard, inbox, outbox, tracker_args, layout),
+                                          daemon=True)
+        process.start()
+        inboxes.append(inbox)
+        processes.append(process)
+
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.connect(zmq_port)
+    socket.setsockopt_string(zmq.SUBSCRIBE, '')  # Subscribe to all messages
+    poller = zmq.Poller()
+    poller.register(socket, zmq.POLLIN)
+
+    # Initialize ZMQ publisher
+    pub_socket = context.socket(zmq.PUB)
+    pub_socket.bind("tcp://*:5556")  # Replace with appropriate port
+
+    print(f"Listening for real-time data on ZMQ port with {workers} workers (batch size {batch_size}, "
+          f"window {batch_window * 1000:.0f} ms)...")
+
+    while True:
+        try:
+            messages, queued = receive_batch(socket, poller, batch_size, batch_window, idle_timeout=100)
+
+            # Broadcast a reloaded rule set to every shard between batches
+            if watcher is not None and watcher.rules is not current_rules:
+                current_rules = watcher.rules
+                for inbox in inboxes:
+                    inbox.put(('rules', current_rules))
+
+            if messages:
+                shards = route_batch(messages, ring, decoder, workers)
+                for inbox, shard_messages in zip(inboxes, shards):
+                    if shard_messages:
+                        inbox.put(('batch', shard_messages))
+                print(f"Batch: {len(messages)} received, queue depth {queued}, per shard "
+                      + "/".join(str(row_count(shard_messages)) for shard_messages in shards)
+                      + (" (batch full, falling behind)" if len(messages) >= batch_size else ""))
+
+            # Publish whatever the workers have finished
+            while True:
+                try:
+                    shard, received, rejected, matches, active, alerts = outbox.get_nowait()
+                except queue.Empty:
+                    break
+                for alert_message in alerts:
+                    print(alert_message)
+                    pub_socket.send_string(alert_message)
+                print(f"Shard {shard}: {received} evaluated, {rejected} rejected, {matches} matches, "
+                      f"{len(alerts)} alerts sent, {active} active")
+
+        except KeyboardInterrupt:
+            print("Stopping ZMQ listener.")
+            break
+        except Exception as e:
+            print(f"Error receiving data: {e}")
+
+    for inbox in inboxes:
+        inbox.put(('stop', None))
+    for process in processes:
+        process.join(timeout=1)
+
+
 # Main execution
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate telemetry from the bus against rules.csv")
     # Filepath to the CSV file containing rules
-    rules_file = r"D:\ad_tewa0.8_stable\FDA\rules.csv"
-    rules_data = load_rules(rules_file)
+    parser.add_argument("--rules", default=r"D:\ad_tewa0.8_stable\FDA\rules.csv")
+    # ZMQ port for receiving data
+    parser.add_argument("--port", default="tcp://localhost:1137")
+    parser.add_argument("--header", help="flight CSV whose header gives the field positions on the bus")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="maximum messages per batch (0 evaluates one message at a time)")
+    parser.add_argument("--batch-window", type=float, default=0.05,
+                        help="seconds to keep filling a batch after the first message")
+    parser.add_argument("--reload-interval", type=float, default=1.0,
+                        help="seconds between checks of the rules file for changes (0 disables reload)")
+    parser.add_argument("--enter-count", type=int, default=2,
+                        help="consecutive matches before an alert is raised")
+    parser.add_argument("--exit-count", type=int, default=5,
+                        help="consecutive non-matches before an alert is cleared")
+    parser.add_argument("--realert-interval", type=float, default=30.0,
+                        help="minimum seconds between reminders for an alert that stays active")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker processes to shard evaluation across by aircraft (0 evaluates in-process)")
+    parser.add_argument("--stream", choices=["bus", "approach"], default="bus",
+                        help="layout of the messages on --port: the telemetry bus, or approach_monitor.py results")
+    args = parser.parse_args()
 
-    # Create the rules based on the CSV file
-    create_dynamic_rules(rules_data)
+    layout = StreamLayout.from_csv(args.header) if args.header else BUS_LAYOUT
+    if args.stream == "approach":
+        # approach_monitor imports this module, so only import it when needed
+        from approach_monitor import APPROACH_LAYOUT
+        layout = APPROACH_LAYOUT
 
-    # ZMQ port for receiving data
-    zmq_port = "tcp://localhost:1137"  # Update to your ZMQ port
+    rules_data = load_rules(args.rules)
+
+    # Compile the rules from the CSV file
+    compiled_rules = compile_rules(rules_data, layout=layout)
 
     # Start evaluating data
-    evaluate_data(zmq_port)
+    if compiled_rules is not None:
+        rules = compiled_rules
+        if args.reload_interval > 0:
+            # Watch the rules file and hot-swap edited rules without a restart
+            rules = RulesWatcher(args.rules, compiled_rules, args.reload_interval, layout)
+            rules.start()
+        tracker_args = (args.enter_count, args.exit_count, args.realert_interval)
+        tracker = AlertTracker(*tracker_args)
+        if args.workers > 0:
+            evaluate_sharded(args.port, rules, tracker_args, args.workers,
+                             max(args.batch_size, 1), args.batch_window, layout)
+        elif args.batch_size > 0:
+            evaluate_batches(args.port, rules, tracker, args.batch_size, args.batch_window, layout)
+        else:
+            evaluate_data(args.port, rules, tracker, layout)
@@ -1,102 +1,119 @@
+import argparse
 import plotly.graph_objects as go
 import math
 import zmq
 import numpy as np
-from dash import Dash, html, dcc
+from dash import Dash, html, dcc, Patch
 from dash.dependencies import Input, Output, State
 import dash
-from collections import deque
+from telemetry import ALTITUDE_UNITS, BUS_LAYOUT, FieldDecoder
+from bus_reader import BusReader, RecentRows
+from approach_geometry import RunwayIndex, load_runways
 
 # Initialize Dash app
 app = Dash(__name__)
 
 # Constants
-GLIDE_SLOPE_ANGLE = 3  # degrees
+GLIDE_SLOPE_ANGLE = 3  # degrees, drawn until the aircraft is on a registered approach
 APPROACH_LENGTH = 0.4  # Length of the approach path
 CORRIDOR_WIDTH = 0.05  # Width of the approach corridor
 CORRIDOR_HEIGHT = 0.02  # Height of the approach corridor
 TRAIL_LENGTH = 50  # Number of positions to keep in trail
 
 # Runway constants
-RUNWAY_TRUE_HEADING = 60  # Runway 60R heading
 RUNWAY_LENGTH_METERS = 2700  # Actual runway length
 RUNWAY_WIDTH_METERS = 45  # Actual runway width
 
-# Base coordinates for Risalpur
-BASE_LAT = 34.07079
-BASE_LON = 71.976469
+# Every registered runway (runways.csv), indexed by threshold position.
+# Each position is drawn in the frame of the approach it is on, at
+# SCENE_SCALE metres per scene unit, so the 0.4-unit approach is 15 km
+RUNWAYS = RunwayIndex(load_runways())
+SCENE_SCALE = 37500
 
-# Initialize position history
-position_history = deque(maxlen=TRAIL_LENGTH)
+# Unit of the bus altitude field (--altitude-unit), converted to metres
+# for the runway geometry
+ALTITUDE_UNIT = BUS_LAYOUT.altitude_unit
 
-# Initialize ZMQ subscriber
-context = zmq.Context()
-socket = context.socket(zmq.SUB)
-socket.connect("tcp://localhost:1137")
-socket.setsockopt_string(zmq.SUBSCRIBE, "")
+# Background reader keeping the latest row, so each refresh shows the
+# newest data however fast the feed. Only the newest message of each burst
+# is decoded.
+decoder = FieldDecoder(['latitude', 'longitude', 'altitude', 'ground_track', 'heading'])
+bus = BusReader("tcp://localhost:1137", decoder.decode, history=RecentRows(1), latest_only=True)
+
+# The trail needs every position, not just the newest of each burst, so a
+# second reader decodes them all into the last TRAIL_LENGTH positions
+trail_decoder = FieldDecoder(['latitude', 'longitude', 'altitude'])
+trail = BusReader("tcp://localhost:1137", trail_decoder.decode, history=RecentRows(TRAIL_LENGTH))
+
+
+def polylines(*groups):
+    """Join groups of polylines, each an array of shape (lines, points, 3),
+    into x, y, z arrays for a single trace, with NaN gaps between lines"""
+    parts = []
+    for lines in groups:
+        lines = np.asarray(lines, dtype=float)
+        padded = np.full((lines.shape[0], lines.shape[1] + 1, 3), np.nan)
+        padded[:, :-1] = lines
+        parts.append(padded.reshape(-1, 3))
+    return np.concatenate(parts)[:-1].T
 
 
 def create_ground_grid():
     """Create ground reference grid"""
     grid_size = 0.5
     grid_points = np.linspace(-grid_size, grid_size, 11)
-    traces = []
-
-    # Create grid lines
-    for x in grid_points:
-        traces.append(go.Scatter3d(
-            x=[x, x],
-            y=[-grid_size, grid_size],
-            z=[0, 0],
-            mode='lines',
-            line=dict(color='lightgray', width=1),
-            showlegend=False
-        ))
-    for y in grid_points:
-        traces.append(go.Scatter3d(
-            x=[-grid_size, grid_size],
-            y=[y, y],
-            z=[0, 0],
-            mode='lines',
-            line=dict(color='lightgray', width=1),
-            showlegend=False
-        ))
-
-    return traces
-
+    n = len(grid_points)
+
+    # Grid lines parallel to Y, then parallel to X, all at ground level
+    lines = np.zeros((2 * n, 2, 3))
+    lines[:n, :, 0] = grid_points[:, None]
+    lines[:n, :, 1] = [-grid_size, grid_size]
+    lines[n:, :, 0] = [-grid_size, grid_size]
+    lines[n:, :, 1] = grid_points[:, None]
+
+    x, y, z = polylines(lines)
+    return [go.Scatter3d(
+        x=x,
+        y=y,
+        z=z,
+        mode='lines',
+        line=dict(color='lightgray', width=1),
+        showlegend=False
+    )]
 
-def transform_coordinates(lat, lon, alt):
-    """Transform coordinates with simple X alignment"""
-    # Convert to local coordinates without rotation
-    x = (lon - BASE_LON) * 5.0
-    y = (lat - BASE_LAT) * 5.0
-    z = alt * 0.0001
 
-    return x, y, z
+def transform_coordinates(runway, lat, lon, alt):
+    """Transform positions (scalars or arrays) to scene coordinates in a
+    runway's frame: X along the runway, negative on the approach, Y left of
+    the centreline, Z up"""
+    along, left, up = runway.to_local(lat, lon, alt)
+    return along / SCENE_SCALE, left / SCENE_SCALE, up / SCENE_SCALE
 
-def create_runway():
-    """Create runway as a straight line along X-axis"""
+def create_runway(runway=None):
+    """Create runway as a straight line along X-axis, from the threshold at
+    the origin down the runway heading, at the scene scale"""
     traces = []
-    runway_length = 0.4  # Total length
-    runway_width = 0.05  # Width
+    runway_length = RUNWAY_LENGTH_METERS / SCENE_SCALE
+    name = runway.name if runway is not None else ""
+    designator = name.rsplit(" ", 1)[-1]
 
     # Main runway surface - aligned with X-axis
     traces.append(go.Scatter3d(
-        x=[-runway_length/2, runway_length/2],
+        x=[0, runway_length],
         y=[0, 0],  # Centered at Y=0
         z=[0, 0],
         mode='lines',
         line=dict(color='gray', width=10),
-        name='Runway 60R/27L'
+        name=f'Runway {name}'.strip()
     ))
 
-    # Add runway designator positions
+    # Add the runway designator at the threshold
     traces.append(go.Scatter3d(
-        x=[-runway_length/2, runway_length/2],
-        y=[0, 0],
-        z=[0.001, 0.001],  # Slightly above ground
+        x=[0],
+        y=[0],
+        z=[0.001],  # Slightly above ground
         mode='text',
-        text=['60R', '27L'],
+        text=[designator],
         textposition='middle center',
         textfont=dict(size=12, color='white'),
         showlegend=False
@@ -104,80 +121,67 @@ def create_runway():
 
     return traces
 
-def create_approach_corridor():
+def create_approach_corridor(glide_slope=GLIDE_SLOPE_ANGLE):
     """Create approach corridor aligned with X-axis"""
-    traces = []
-    
-    # Calculate heights based on glide slope
+    slope = np.tan(math.radians(glide_slope))
+    half_width, half_height = CORRIDOR_WIDTH / 2, CORRIDOR_HEIGHT / 2
+
+    # Corridor boundaries: four lines along the glide slope, negative X for approach
     distances = np.linspace(0, APPROACH_LENGTH, 50)
-    heights = np.tan(math.radians(GLIDE_SLOPE_ANGLE)) * distances
-
-    # Create corridor boundaries
-    for y_offset in [-CORRIDOR_WIDTH/2, CORRIDOR_WIDTH/2]:
-        for z_offset in [-CORRIDOR_HEIGHT/2, CORRIDOR_HEIGHT/2]:
-            traces.append(go.Scatter3d(
-                x=[-d for d in distances],  # Negative X for approach
-                y=[y_offset] * len(distances),
-                z=heights + z_offset,
-                mode='lines',
-                line=dict(color='blue', width=1),
-                showlegend=False
-            ))
-
-    # Vertical lines
-    num_verticals = 8
-    for i in range(num_verticals):
-        x = -APPROACH_LENGTH * i / (num_verticals - 1)
-        h = np.tan(math.radians(GLIDE_SLOPE_ANGLE)) * abs(x)
-        
-        traces.append(go.Scatter3d(
-            x=[x, x],
-            y=[-CORRIDOR_WIDTH/2, CORRIDOR_WIDTH/2],
-            z=[h - CORRIDOR_HEIGHT/2, h - CORRIDOR_HEIGHT/2],
-            mode='lines',
-            line=dict(color='blue', width=1),
-            showlegend=False
-        ))
-        
-        traces.append(go.Scatter3d(
-            x=[x, x],
-            y=[-CORRIDOR_WIDTH/2, CORRIDOR_WIDTH/2],
-            z=[h + CORRIDOR_HEIGHT/2, h + CORRIDOR_HEIGHT/2],
-            mode='lines',
-            line=dict(color='blue', width=1),
-            showlegend=False
-        ))
-
-        # Vertical corner lines
-        for y in [-CORRIDOR_WIDTH/2, CORRIDOR_WIDTH/2]:
-            traces.append(go.Scatter3d(
-                x=[x, x],
-                y=[y, y],
-                z=[h - CORRIDOR_HEIGHT/2, h + CORRIDOR_HEIGHT/2],
-                mode='lines',
-                line=dict(color='blue', width=1),
-                showlegend=False
-            ))
+    heights = slope * distances
+    boundaries = np.array([
+        np.column_stack([-distances, np.full_like(distances, y_offset), heights + z_offset])
+        for y_offset in [-half_width, half_width]
+        for z_offset in [-half_height, half_height]
+    ])
 
-    return traces
+    # Cross-sections: bottom and top cross lines and the two vertical corner
+    # lines at each station
+    num_verticals = 8
+    x = -APPROACH_LENGTH * np.arange(num_verticals) / (num_verticals - 1)
+    low, high = slope * -x - half_height, slope * -x + half_height
+    left, right = np.full_like(x, -half_width), np.full_like(x, half_width)
+    starts = [(left, low), (left, high), (left, low), (right, low)]
+    ends = [(right, low), (right, high), (left, high), (right, high)]
+    sections = np.array([
+        np.stack([np.column_stack([x, y0, z0]), np.column_stack([x, y1, z1])], axis=1)
+        for (y0, z0), (y1, z1) in zip(starts, ends)
+    ]).reshape(-1, 2, 3)
+
+    x, y, z = polylines(boundaries, sections)
+    return [go.Scatter3d(
+        x=x,
+        y=y,
+        z=z,
+        mode='lines',
+        line=dict(color='blue', width=1),
+        showlegend=False
+    )]
 
 
-def create_glideslope():
-    """Create 3-degree glideslope line aligned with X-axis"""
+def create_glideslope(glide_slope=GLIDE_SLOPE_ANGLE):
+    """Create glideslope line aligned with X-axis"""
     x_points = np.linspace(-APPROACH_LENGTH, 0, 100)
-    z_points = np.tan(math.radians(GLIDE_SLOPE_ANGLE)) * -x_points
-    
+    z_points = np.tan(math.radians(glide_slope)) * -x_points
+
     return go.Scatter3d(
         x=x_points,
         y=[0] * len(x_points),  # Centered at Y=0
         z=z_points,
         mode='lines',
         line=dict(color='yellow', width=3, dash='dot'),
-        name='3° Glideslope'
+        name=f'{glide_slope:g}° Glideslope'
     )
 
 
-def create_aircraft(x, y, z, heading=0, ground_track=0, scale=0.02):
+def create_approach_scene(runway=None):
+    """Runway, approach corridor and glide slope of the runway being flown,
+    or of a generic approach before any runway has been matched"""
+    glide_slope = runway.glide_slope if runway is not None else GLIDE_SLOPE_ANGLE
+    return create_runway(runway) + create_approach_corridor(glide_slope) + [create_glideslope(glide_slope)]
+
+
+def create_aircraft(x, y, z, heading=0, ground_track=0, scale=0.02, runway_heading=0):
     """Create aircraft triangle with proper orientation"""
     points = np.array([
         [scale, 0, 0],  # nose
@@ -186,7 +190,7 @@ def create_aircraft(x, y, z, heading=0, ground_track=0, scale=0.02):
     ])
 
     # Create rotation matrix for heading
-    heading_rad = math.radians(heading - RUNWAY_TRUE_HEADING)  # Adjust heading relative to runway
+    heading_rad = math.radians(heading - runway_heading)  # Adjust heading relative to runway
     heading_matrix = np.array([
         [math.cos(heading_rad), -math.sin(heading_rad), 0],
         [math.sin(heading_rad), math.cos(heading_rad), 0],
@@ -209,34 +213,20 @@ def create_aircraft(x, y, z, heading=0, ground_track=0, scale=0.02):
     )
 
 
-def create_trail():
+def create_trail(positions):
     """Create trail from position history"""
-    if not position_history:
-        return []
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
 
-    positions = list(position_history)
     return go.Scatter3d(
-        x=[p[0] for p in positions],
-        y=[p[1] for p in positions],
-        z=[p[2] for p in positions],
+        x=positions[:, 0],
+        y=positions[:, 1],
+        z=positions[:, 2],
         mode='lines',
         line=dict(color='cyan', width=2),
         name='Flight Path'
     )
 
 
-def calculate_deviations(x, y, z):
-    """Calculate localizer and glideslope deviations"""
-    # Calculate localizer deviation (lateral)
-    loc_deviation = y / (CORRIDOR_WIDTH / 2) * 100  # Percentage of max width
-
-    # Calculate glideslope deviation
-    expected_height = abs(x) * math.tan(math.radians(GLIDE_SLOPE_ANGLE))
-    gs_deviation = (z - expected_height) / (CORRIDOR_HEIGHT / 2) * 100
-
-    return loc_deviation, gs_deviation
-
-
 def get_default_layout():
     """Get default layout with camera settings"""
     return dict(
@@ -252,7 +242,9 @@ def get_default_layout():
                 up=dict(x=0, y=0, z=1)
             )
         ),
-        title="Approach Visualization - Risalpur (60R/27L)",
+        title="Approach Visualization",
+        # Keep the user's camera and zoom across the per-tick updates
+        uirevision='scene',
         showlegend=True,
         height=800,
         width=1000,
@@ -260,6 +252,44 @@ def get_default_layout():
     )
 
 
+# The scene is built once and sent to the browser once with the initial
+# figure; afterwards each tick only patches the trail and aircraft traces
+# that follow it, and the approach traces only when the matched runway
+# changes.
+GROUND_TRACES = create_ground_grid()
+STATIC_TRACES = GROUND_TRACES + create_approach_scene()
+APPROACH_TRACES = range(len(GROUND_TRACES), len(STATIC_TRACES))
+TRAIL_TRACE = len(STATIC_TRACES)
+AIRCRAFT_TRACE = TRAIL_TRACE + 1
+
+CAMERAS = {
+    'btn-top': dict(
+        eye=dict(x=0, y=0, z=2),
+        center=dict(x=0, y=0, z=0),
+        up=dict(x=0, y=1, z=0)
+    ),
+    'btn-side': dict(
+        eye=dict(x=-2, y=0, z=-0.3),
+        center=dict(x=0, y=0, z=0),
+        up=dict(x=0, y=0, z=1)
+    ),
+    'btn-approach': dict(
+        eye=dict(x=-1.5, y=1.2, z=0),
+        center=dict(x=0, y=0, z=0),
+        up=dict(x=0, y=0, z=1)
+    ),
+}
+
+
+def create_initial_figure():
+    """Static scene plus an empty trail and the aircraft parked on the approach"""
+    traces = STATIC_TRACES + [
+        create_trail([]),
+        create_aircraft(-0.2, 0, 0.06, heading=0, ground_track=0)
+    ]
+    return go.Figure(data=traces, layout=get_default_layout())
+
+
 app.layout = html.Div([
     html.Div([
         # Data Display Panel
@@ -269,6 +299,7 @@ app.layout = html.Div([
             html.Div(id='distance-display', className='data-item'),
             html.Div(id='heading-display', className='data-item'),
             html.Div(id='deviation-display', className='data-item'),
+            html.Div(id='lag-display', className='data-item'),
         ], style={
             'width': '20%',
             'padding': '10px',
@@ -287,6 +318,7 @@ app.layout = html.Div([
 
             dcc.Graph(
                 id='basic-plot',
+                figure=create_initial_figure(),
                 style={'height': '85vh'},
                 config={'scrollZoom': True}
             )
@@ -299,129 +331,112 @@ app.layout = html.Div([
 
     dcc.Interval(
         id='interval-component',
-        interval=5000,
+        interval=250,
         n_intervals=0
     ),
-    dcc.Store(id='camera-position'),
-    dcc.Store(id='flight-data')
+    dcc.Store(id='flight-data'),
+    # Name of the runway this page's approach traces are drawn for
+    dcc.Store(id='scene-runway')
 ])
 
 
 @app.callback(
     [Output('basic-plot', 'figure'),
-     Output('flight-data', 'data')],
+     Output('flight-data', 'data'),
+     Output('scene-runway', 'data')],
     [Input('interval-component', 'n_intervals'),
      Input('btn-top', 'n_clicks'),
      Input('btn-side', 'n_clicks'),
      Input('btn-approach', 'n_clicks')],
-    [State('basic-plot', 'figure'),
-     State('camera-position', 'data')]
+    [State('scene-runway', 'data')]
 )
-def update_figure(n, btn_top, btn_side, btn_approach, existing_figure, camera_pos):
+def update_figure(n, btn_top, btn_side, btn_approach, scene_runway):
     ctx = dash.callback_context
-    traces = []
+    # Only the changed parts of the figure are sent to the browser
+    figure = Patch()
     flight_data = {}
-
-    # Add basic elements
-    traces.extend(create_ground_grid())
-    traces.extend(create_runway())
-    traces.extend(create_approach_corridor())
-    traces.append(create_glideslope())
+    drawn_runway = dash.no_update
 
     try:
-        message = socket.recv_string(flags=zmq.NOBLOCK)
-        message_parts = message.split("|")
-        if len(message_parts) >= 18:
-            try:
-                # Extract position parameters
-                x, y, z = transform_coordinates(
-                    float(message_parts[4]),  # latitude
-                    float(message_parts[5]),  # longitude
-                    float(message_parts[6])  # altitude
-                )
-
-                # Extract heading and ground track
-                ground_track = float(message_parts[8])
-                mag_heading = float(message_parts[17])
-
-                # Store position in history
-                position_history.append((x, y, z))
-
-                # Add trail
-                if len(position_history) > 1:
-                    traces.append(create_trail())
-
-                # Calculate deviations
-                loc_dev, gs_dev = calculate_deviations(x, y, z)
-
-                # Update flight data
-                flight_data = {
-                    'altitude': float(message_parts[6]),  # feet
-                    'distance': abs(x) * 1000,  # approximate meters from threshold
-                    'heading': mag_heading,
-                    'track': ground_track,
-                    'loc_deviation': loc_dev,
-                    'gs_deviation': gs_dev
-                }
-
-                # Add aircraft
-                aircraft = create_aircraft(x, y, z, mag_heading, ground_track)
-                traces.append(aircraft)
-
-            except ValueError as e:
-                print(f"Invalid data format: {e}")
+        latest, _, _ = bus.snapshot()
+        if latest is None:
+            raise zmq.Again()
+        latitude, longitude, altitude, ground_track, mag_heading = latest
+
+        # Approach the aircraft is on, and its position in that runway's
+        # frame, metres, and in the scene
+        metres_per_altitude = ALTITUDE_UNITS[ALTITUDE_UNIT]
+        runway, local = RUNWAYS.match(float(latitude), float(longitude), float(altitude) * metres_per_altitude)
+        if runway is None:
+            figure['layout']['title'] = "Approach Visualization - no approach within range"
+            raise zmq.Again()
+        figure['layout']['title'] = f"Approach Visualization - {runway.name}"
+        if runway.name != scene_runway:
+            # Redraw the runway, corridor and glide slope for the new approach
+            for index, trace in zip(APPROACH_TRACES, create_approach_scene(runway)):
+                figure['data'][index] = trace.to_plotly_json()
+            drawn_runway = runway.name
+        along, left, up = local
+        x, y, z = along / SCENE_SCALE, left / SCENE_SCALE, up / SCENE_SCALE
+
+        # Add trail from the positions received since the last refresh and
+        # before, transformed together
+        rows = np.array([row for _, row in trail.history.snapshot()], dtype=float).reshape(-1, 3)
+        if len(rows) > 1:
+            positions = np.column_stack(transform_coordinates(runway, rows[:, 0], rows[:, 1],
+                                                              rows[:, 2] * metres_per_altitude))
+            figure['data'][TRAIL_TRACE] = create_trail(positions).to_plotly_json()
+
+        # Angular deviations from the localizer and glide slope
+        loc_dev, gs_dev = runway.deviations(along, left, up)
+
+        # Update flight data
+        flight_data = {
+            'altitude': altitude,  # as published on the bus, in ALTITUDE_UNIT
+            'altitude_unit': ALTITUDE_UNIT,
+            'distance': float(abs(along)),  # meters from threshold along the runway axis
+            'heading': mag_heading,
+            'track': ground_track,
+            'loc_deviation': float(loc_dev),
+            'gs_deviation': float(gs_dev),
+            'lag': bus.lag()[0]
+        }
+
+        # Add aircraft
+        aircraft = create_aircraft(x, y, z, mag_heading, ground_track, runway_heading=runway.heading)
+        figure['data'][AIRCRAFT_TRACE] = aircraft.to_plotly_json()
     except zmq.Again:
-        aircraft = create_aircraft(-0.2, 0, 0.06, heading=0, ground_track=0)
-        traces.append(aircraft)
+        # No data yet, or not on any approach: the aircraft stays where it was
+        pass
+    except (IndexError, ValueError) as e:
+        print(f"Invalid data format: {e}")
     except Exception as e:
         print(f"Error: {e}")
 
-    # Handle layout and camera
-    if existing_figure and 'layout' in existing_figure:
-        layout = existing_figure['layout']
-    else:
-        layout = get_default_layout()
-
+    # View buttons move the camera; otherwise the browser keeps its own
     if ctx.triggered:
         button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        if button_id == 'btn-top':
-            layout['scene']['camera'] = dict(
-                eye=dict(x=0, y=0, z=2),
-                center=dict(x=0, y=0, z=0),
-                up=dict(x=0, y=1, z=0)
-            )
-        elif button_id == 'btn-side':
-            layout['scene']['camera'] = dict(
-                eye=dict(x=-2, y=0, z=-0.3),
-                center=dict(x=0, y=0, z=0),
-                up=dict(x=0, y=0, z=1)
-            )
-        elif button_id == 'btn-approach':
-            layout['scene']['camera'] = dict(
-                eye=dict(x=-1.5, y=1.2, z=0),
-                center=dict(x=0, y=0, z=0),
-                up=dict(x=0, y=0, z=1)
-            )
-    elif camera_pos:
-        layout['scene']['camera'] = camera_pos
+        if button_id in CAMERAS:
+            figure['layout']['scene']['camera'] = CAMERAS[button_id]
 
-    return {'data': traces, 'layout': layout}, flight_data
+    return figure, flight_data, drawn_runway
 
 
 @app.callback(
     [Output('altitude-display', 'children'),
      Output('distance-display', 'children'),
      Output('heading-display', 'children'),
-     Output('deviation-display', 'children')],
+     Output('deviation-display', 'children'),
+     Output('lag-display', 'children')],
     Input('flight-data', 'data')
 )
 def update_data_display(flight_data):
     if not flight_data:
-        return ["No data"] * 4
+        return ["No data"] * 5
 
     altitude = html.Div([
         html.Strong("Altitude: "),
-        f"{flight_data['altitude']:.0f} ft"
+        f"{flight_data['altitude']:.0f} {flight_data['altitude_unit']}"
     ])
 
     distance = html.Div([
@@ -436,22 +451,23 @@ def update_data_display(flight_data):
 
     deviation = html.Div([
         html.Strong("LOC/GS Dev: "),
-        f"{flight_data['loc_deviation']:.1f}% / {flight_data['gs_deviation']:.1f}%"
+        f"{flight_data['loc_deviation']:.2f}° / {flight_data['gs_deviation']:.2f}°"
     ])
 
-    return altitude, distance, heading, deviation
-
+    # How far the display trails the bus
+    lag = html.Div([
+        html.Strong("Data age: "),
+        f"{flight_data['lag']:.1f} s"
+    ])
 
-@app.callback(
-    Output('camera-position', 'data'),
-    Input('basic-plot', 'relayoutData'),
-    State('camera-position', 'data')
-)
-def store_camera_position(relayout_data, current_pos):
-    if relayout_data and 'scene.camera' in relayout_data:
-        return relayout_data['scene.camera']
-    return current_pos
+    return altitude, distance, heading, deviation, lag
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show the approach the aircraft on the bus is flying")
+    parser.add_argument("--altitude-unit", choices=sorted(ALTITUDE_UNITS), default=ALTITUDE_UNIT,
+                        help="unit of the altitude field on the bus")
+    ALTITUDE_UNIT = parser.parse_args().altitude_unit
+    bus.start()
+    trail.start()
     app.run_server(port=8051, debug=True)
\ No newline at end of file
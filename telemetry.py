@@ -0,0 +1,348 @@
+import csv
+import json
+import re
+import struct
+import zlib
+from time import monotonic
+
+import numpy as np
+import zmq
+
+# Binary telemetry frames share the bus with the pipe-delimited text messages.
+# A frame is an 8 byte header (magic, schema id) followed by one or more rows
+# of a NumPy structured dtype. Publishers periodically announce the dtype as a
+# schema message so subscribers that join late can decode the frames.
+FRAME_MAGIC = b'FDAB'
+SCHEMA_MAGIC = b'FDAS'
+HEADER = struct.Struct('<4sI')
+
+# Bus positions of the fields the consumers use, for streams whose header is
+# not known. A header from the flight CSV overrides these by column name.
+FIELD_POSITIONS = {
+    'timestamp': 0,
+    'identity': 1,
+    'mode': 2,
+    'phase': 3,
+    'latitude': 4,
+    'longitude': 5,
+    'altitude': 6,
+    'speed': 7,
+    'ground_track': 8,
+    'time': 14,
+    'heading': 17,
+    'cht_6': 72, 'egt_6': 73,
+    'cht_5': 74, 'egt_5': 75,
+    'cht_4': 76, 'egt_4': 77,
+    'cht_3': 78, 'egt_3': 79,
+    'cht_2': 80, 'egt_2': 81,
+    'cht_1': 82, 'egt_1': 83,
+}
+
+# Fields decoded as text; everything else is decoded as float
+TEXT_FIELDS = {'timestamp', 'identity', 'mode', 'phase', 'time'}
+
+# Metres per unit of the altitude field. The bus carries feet unless a
+# stream says otherwise.
+ALTITUDE_UNITS = {'ft': 0.3048, 'm': 1.0}
+
+
+class TelemetrySchema:
+    """Fixed binary row layout: column names with a NumPy type each"""
+
+    def __init__(self, columns, kinds):
+        self.columns = list(columns)
+        self.kinds = list(kinds)
+        # Fields are numbered rather than named after the columns, so that any
+        # CSV header (duplicates, spaces, symbols) gives a valid dtype
+        self.dtype = np.dtype({'names': [f"f{i}" for i in range(len(self.columns))],
+                               'formats': self.kinds})
+        self.description = json.dumps([self.columns, self.kinds]).encode('utf-8')
+        self.id = zlib.crc32(self.description)
+
+    @classmethod
+    def from_description(cls, description):
+        columns, kinds = json.loads(bytes(description).decode('utf-8'))
+        return cls(columns, kinds)
+
+    @classmethod
+    def from_dataframe(cls, data_df):
+        """Numeric columns become float64, everything else fixed-width text"""
+        kinds = []
+        for col in data_df.columns:
+            if data_df[col].dtype.kind in 'biuf':
+                kinds.append('<f8')
+            else:
+                width = int(data_df[col].astype(str).str.len().max()) if len(data_df) else 1
+                kinds.append(f"<U{max(width, 1)}")
+        return cls(data_df.columns, kinds)
+
+    def widen(self, data_df):
+        """Schema that also holds the rows of a DataFrame with the same
+        columns: text wherever either has text, wide enough for both.
+        Returns this schema when it already fits."""
+        kinds = []
+        for col, kind in zip(self.columns, self.kinds):
+            values = data_df[col]
+            if kind.startswith('<U') or values.dtype.kind not in 'biuf':
+                width = int(values.astype(str).str.len().max()) if len(data_df) else 1
+                if kind.startswith('<U'):
+                    width = max(width, int(kind[2:]))
+                kind = f"<U{max(width, 1)}"
+            kinds.append(kind)
+        return self if kinds == self.kinds else TelemetrySchema(self.columns, kinds)
+
+    def to_records(self, data_df):
+        """Convert a DataFrame with this schema's columns into a structured array"""
+        records = np.empty(len(data_df), dtype=self.dtype)
+        for i, (col, kind) in enumerate(zip(self.columns, self.kinds)):
+            values = data_df[col]
+            if kind.startswith('<U'):
+                values = values.astype(str)
+            records[f"f{i}"] = values.to_numpy()
+        return records
+
+    def pack(self, rows):
+        """Build a structured array from sequences of field values"""
+        return np.array([tuple(row) for row in rows], dtype=self.dtype)
+
+    def announcement(self):
+        return HEADER.pack(SCHEMA_MAGIC, self.id) + self.description
+
+    def encode(self, records):
+        return HEADER.pack(FRAME_MAGIC, self.id) + np.ascontiguousarray(records, dtype=self.dtype).tobytes()
+
+
+class FramePublisher:
+    """Send telemetry rows as text messages or binary frames"""
+
+    def __init__(self, socket, schema, binary=False, announce_interval=1.0):
+        self.socket = socket
+        self.schema = schema
+        self.binary = binary
+        self.announce_interval = announce_interval
+        self._last_announce = None
+
+    def announce(self, force=False):
+        now = monotonic()
+        if force or self._last_announce is None or now - self._last_announce >= self.announce_interval:
+            self.socket.send(self.schema.announcement())
+            self._last_announce = now
+
+    def use_schema(self, schema):
+        """Send with another schema from now on, announcing it straight away
+        when it differs from the current one"""
+        if schema.id != self.schema.id:
+            self.schema = schema
+            self.announce(force=True)
+        else:
+            self.announce()
+
+    def send_records(self, records):
+        """Send a structured array of rows, as one frame or one text message per row"""
+        if self.binary:
+            self.announce()
+            self.socket.send(self.schema.encode(records))
+        else:
+            for record in records:
+                self.socket.send_string("|".join(str(value) for value in record.tolist()))
+
+    def send_values(self, values):
+        """Send a single row given as a sequence of field values"""
+        if self.binary:
+            self.send_records(self.schema.pack([values]))
+        else:
+            self.socket.send_string("|".join(str(value) for value in values))
+
+
+class FrameDecoder:
+    """Decode text messages and binary frames from the bus into rows.
+
+    decode() returns a list holding the split fields of a text message, or a
+    structured array viewing the frame buffer for a binary frame. Either way
+    each row can be indexed by field position. Schema announcements, and
+    frames whose schema has not been announced yet, decode to no rows.
+    """
+
+    def __init__(self):
+        self.schemas = {}
+
+    def decode(self, message):
+        if isinstance(message, str):
+            return [message.split("|")]
+        buffer = memoryview(message)
+        if bytes(buffer[:4]) in (FRAME_MAGIC, SCHEMA_MAGIC):
+            _, records = self.decode_frame(buffer)
+            return records
+        return [bytes(buffer).decode('utf-8').split("|")]
+
+    def decode_frame(self, buffer):
+        """Return (schema, records) for a binary frame or schema announcement"""
+        magic, schema_id = HEADER.unpack_from(buffer)
+        if magic == SCHEMA_MAGIC:
+            if schema_id not in self.schemas:
+                self.schemas[schema_id] = TelemetrySchema.from_description(buffer[HEADER.size:])
+            return None, []
+        schema = self.schemas.get(schema_id)
+        if schema is None:
+            return None, []
+        return schema, np.frombuffer(buffer, dtype=schema.dtype, offset=HEADER.size)
+
+
+# Field name used for a CSV column, e.g. "GPS Date & Time" -> "gps_date_time"
+def field_name(column):
+    return re.sub(r'[^0-9a-z]+', '_', str(column).strip().lower()).strip('_')
+
+
+# Field positions for a CSV header, falling back to the known bus positions
+def header_positions(columns):
+    positions = dict(FIELD_POSITIONS)
+    positions.update((field_name(column), i) for i, column in enumerate(columns))
+    return positions
+
+
+# Read only the header line of a flight CSV
+def read_header(file_path):
+    with open(file_path, encoding='utf-8-sig') as csv_file:
+        return next(csv.reader(csv_file))
+
+
+class StreamLayout:
+    """Positions of the named fields in one stream's messages, which of
+    them are text, and the unit of its altitude field (a key of
+    ALTITUDE_UNITS). The telemetry bus uses BUS_LAYOUT; streams derived
+    from it, like the approach monitor's results, bring their own."""
+
+    def __init__(self, positions, text_fields=(), altitude_unit='ft'):
+        self.positions = dict(positions)
+        self.text_fields = set(text_fields)
+        self.altitude_unit = altitude_unit
+        self.metres_per_altitude = ALTITUDE_UNITS[altitude_unit]
+
+    @classmethod
+    def from_csv(cls, file_path, altitude_unit='ft'):
+        """The bus as published from a flight CSV: fields at the positions
+        of its header's columns, falling back to the known bus positions"""
+        return cls(header_positions(read_header(file_path)), TEXT_FIELDS, altitude_unit)
+
+    def with_altitude_unit(self, altitude_unit):
+        return StreamLayout(self.positions, self.text_fields, altitude_unit)
+
+
+BUS_LAYOUT = StreamLayout(FIELD_POSITIONS, TEXT_FIELDS)
+
+
+class FieldDecoder:
+    """Extract a fixed set of named fields from bus messages.
+
+    Field positions are resolved once, from the stream's layout, and used
+    for both kinds of message: field i of a text message is column f{i} of
+    a binary frame. Text messages are split only as far as the last
+    requested field, and binary frames are read column-wise.
+    """
+
+    def __init__(self, fields, frames=None, layout=BUS_LAYOUT):
+        self.fields = list(fields)
+        self.positions = dict(layout.positions)
+        self.offsets = self._offsets(self.positions)
+        self.types = [str if field in layout.text_fields else float for field in self.fields]
+        self.maxsplit = max(self.offsets, default=0) + 1
+        self.frames = frames if frames is not None else FrameDecoder()
+
+    def _offsets(self, positions):
+        missing = [field for field in self.fields if field not in positions]
+        if missing:
+            raise ValueError(f"Unknown telemetry fields: {', '.join(missing)}")
+        return [positions[field] for field in self.fields]
+
+    def decode_text(self, message):
+        """Return the requested fields of a text message as a typed tuple"""
+        parts = message.split("|", self.maxsplit)
+        return tuple(kind(parts[offset]) for kind, offset in zip(self.types, self.offsets))
+
+    def decode_records(self, schema, records):
+        """Return one typed column per requested field, viewing the frame where possible"""
+        names = records.dtype.names
+        if len(names) < self.maxsplit:
+            raise ValueError(f"Frame has {len(names)} fields, decoding needs {self.maxsplit}")
+        columns = []
+        for kind, offset in zip(self.types, self.offsets):
+            column = records[names[offset]]
+            columns.append(column.astype(str) if kind is str else column.astype(np.float64, copy=False))
+        return columns
+
+    def decode_columns(self, message):
+        """Return (text_row, columns): a typed tuple for a text message, or
+        typed columns for a binary frame (None, [] when there are no rows).
+        The message may also be a (schema, records) pair decoded upstream."""
+        if isinstance(message, tuple):
+            return None, self.decode_records(*message)
+        if not isinstance(message, str):
+            buffer = memoryview(message)
+            if bytes(buffer[:4]) in (FRAME_MAGIC, SCHEMA_MAGIC):
+                schema, records = self.frames.decode_frame(buffer)
+                if schema is None or len(records) == 0:
+                    return None, []
+                return None, self.decode_records(schema, records)
+            message = bytes(buffer).decode('utf-8')
+        return self.decode_text(message), None
+
+    def decode(self, message):
+        """Return the requested fields of every row in a message as typed tuples"""
+        row, columns = self.decode_columns(message)
+        if row is not None:
+            return [row]
+        if not columns:
+            return []
+        return list(zip(*(column.tolist() for column in columns)))
+
+
+# Receive one message without copying it out of the ZMQ frame
+def recv_frame(socket, flags=0):
+    return socket.recv(flags=flags, copy=False).buffer
+
+
+# Subscribe to everything published on an address
+def subscribe(context, address):
+    socket = context.socket(zmq.SUB)
+    socket.connect(address)
+    socket.setsockopt_string(zmq.SUBSCRIBE, "")
+    return socket
+
+
+def is_announcement(message):
+    return not isinstance(message, str) and bytes(memoryview(message)[:4]) == SCHEMA_MAGIC
+
+
+# Latest-value read for display clients: drain everything pending and
+# decode only the newest message, still registering any schema
+# announcements on the way. Returns that message's rows, or [] when
+# nothing new has arrived.
+def recv_latest(socket, decoder):
+    latest = None
+    while True:
+        try:
+            message = socket.recv(flags=zmq.NOBLOCK)
+        except zmq.Again:
+            break
+        if is_announcement(message):
+            decoder.decode(message)
+        else:
+            latest = message
+    return decoder.decode(latest) if latest is not None else []
+
+
+# Drain everything pending and decode all of it, oldest first. Returns the
+# rows of every message, or [] when nothing new has arrived. A malformed
+# message is reported and skipped so it doesn't drop the rest of the drain.
+def recv_all(socket, decoder):
+    rows = []
+    while True:
+        try:
+            message = recv_frame(socket, flags=zmq.NOBLOCK)
+        except zmq.Again:
+            break
+        try:
+            rows.extend(decoder.decode(message))
+        except (IndexError, ValueError) as e:
+            print(f"Skipping malformed message: {e}")
+    return rows
@@ -0,0 +1,45 @@
+import math
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from approach_geometry import RunwayFrame, RunwayIndex
+
+
+def brute_force_match(runways, lat, lon, alt, capture_range, sector):
+    best = None
+    for runway in runways:
+        along, left, up = runway.to_local(lat, lon, alt)
+        distance = math.hypot(along, left)
+        if along < 0 and distance <= capture_range and abs(math.degrees(math.atan2(left, -along))) <= sector:
+            if best is None or distance < best[0]:
+                best = (distance, runway)
+    return best[1] if best else None
+
+
+def test_runway_index_matches_brute_force():
+    rng = np.random.default_rng(23)
+    for centre_lat in (0.0, 52.0, 78.0):
+        runways = [RunwayFrame(centre_lat + rng.uniform(-2, 2), rng.uniform(-4, 4), rng.uniform(0, 360),
+                               elevation=rng.uniform(0, 500), name=f"RWY{i}")
+                   for i in range(100)]
+        index = RunwayIndex(runways)
+        matched = 0
+        for lat, lon in zip(centre_lat + rng.uniform(-2, 2, 1000), rng.uniform(-4, 4, 1000)):
+            runway, _ = index.match(lat, lon, 1000.0)
+            assert runway is brute_force_match(runways, lat, lon, 1000.0, index.capture_range, index.sector)
+            matched += runway is not None
+        assert matched > 0
+
+
+def test_to_local_and_to_geodetic_round_trip():
+    rng = np.random.default_rng(7)
+    runway = RunwayFrame(51.47, -0.46, 269.7, elevation=25.0, name="EGLL 27R")
+    along, left, up = rng.uniform(-30000, 5000, 500), rng.uniform(-3000, 3000, 500), rng.uniform(0, 3000, 500)
+    lat, lon, alt = runway.to_geodetic(along, left, up)
+    assert np.allclose(alt, up + 25.0)
+    assert np.allclose(runway.to_local(lat, lon, alt), (along, left, up), atol=1e-6)
+    # The threshold is the origin and the approach lies before it
+    assert np.allclose(runway.to_local(51.47, -0.46, 25.0), (0.0, 0.0, 0.0))
+    assert runway.to_local(51.47, -0.40, 25.0)[0] < 0
@@ -0,0 +1,26 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from flight_store import FlightStore
+
+
+def write_flight(path, start, rows):
+    pd.DataFrame({"GPS Date & Time": pd.date_range(start, periods=rows, freq="s"),
+                  "Identity": ["AC1"] * rows, "Alt": range(rows)}).to_csv(path, index=False)
+
+
+def test_ingest_is_idempotent_and_merges_overlaps(tmp_path):
+    store = FlightStore(str(tmp_path / "store"))
+    write_flight(tmp_path / "a.csv", "2024-01-01 00:00:00", 25)
+    write_flight(tmp_path / "b.csv", "2024-01-01 00:00:00", 30)
+    store.ingest(str(tmp_path / "a.csv"))
+    store.ingest(str(tmp_path / "a.csv"))
+    assert len(store.query("AC1", ["alt"])["time"]) == 25
+    # b.csv repeats a.csv's 25 rows and adds 5 more
+    store.ingest(str(tmp_path / "b.csv"))
+    result = store.query("AC1", ["alt"])
+    assert result["alt"].tolist() == list(range(30))
+    # The datetime column is the time index, not a field
+    assert "gps_date_time" not in store.fields("AC1")
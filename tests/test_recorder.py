@@ -0,0 +1,47 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from recorder import Recorder, SegmentWriter, read_recording
+from replay import StreamingFlight
+from telemetry import FrameDecoder, TelemetrySchema
+
+SCHEMA = TelemetrySchema(["id", "alt"], ["<U4", "<f8"])
+TEXT_7 = [b"ts|AC|M|P|0|71|0", b"ts|AC|M|P|1|72|0"]
+TEXT_6 = [b"ts|AC|M|P|2|73", b"ts|AC|M|P|3|74"]
+
+
+def record(directory):
+    # 7-field text, a binary frame, then 6-field text: three segments
+    writer = SegmentWriter(directory)
+    recorder = Recorder(writer)
+    messages = TEXT_7 + [SCHEMA.announcement(), SCHEMA.encode(SCHEMA.pack([("Y", 2.0), ("Z", 3.0)]))] + TEXT_6
+    for now, message in enumerate(messages):
+        recorder.add(memoryview(message), float(now))
+    recorder.flush()
+    while not writer.pending.empty():
+        writer.write(*writer.pending.get())
+
+
+def test_replay_recording_with_layout_changes(tmp_path):
+    record(str(tmp_path))
+    chunks = list(read_recording(str(tmp_path)))
+    assert [len(data_df.columns) for data_df, _ in chunks] == [7, 2, 6]
+
+    text = StreamingFlight()
+    for data_df, recv_time in chunks:
+        text.append(data_df, recv_time)
+    assert [bytes(text.frame(i)) for i in range(len(text))] == TEXT_7 + [b"Y|2.0", b"Z|3.0"] + TEXT_6
+
+    binary = StreamingFlight(binary=True)
+    for data_df, recv_time in chunks:
+        binary.append(data_df, recv_time)
+    frames = FrameDecoder()
+    for schema in binary.schemas(0, len(binary)):
+        frames.decode(schema.announcement())
+    rows = [row for message in binary.batch(0, len(binary)) for row in frames.decode(bytes(message)).tolist()]
+    assert rows[:2] == [tuple(m.decode().split("|")) for m in TEXT_7]
+    assert rows[2:4] == [("Y", 2.0), ("Z", 3.0)]
+    assert rows[4:] == [tuple(m.decode().split("|")) for m in TEXT_6]
+    assert np.array_equal(binary.unix_time, [0, 1, 3, 3, 4, 5])
@@ -0,0 +1,63 @@
+import os
+import sys
+from time import monotonic
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from replay import EncodedFlight, StreamingFlight, cache_path, read_flight, replay_flight
+from telemetry import FrameDecoder
+
+
+def test_encode_text_with_missing_cell():
+    # A missing text cell is sent as "nan", like str() of the field
+    data_df = pd.DataFrame({"Id": ["A", None], "Alt": [1.5, 2.0]})
+    flight = EncodedFlight.encode(data_df)
+    assert [bytes(flight.frame(i)) for i in range(len(flight))] == [b"A|1.5", b"nan|2.0"]
+
+
+def test_streaming_schema_widens_for_later_chunks():
+    # Longer text, and text in a column that was all NaN so far, must not
+    # be truncated or fail to encode
+    flight = StreamingFlight(binary=True)
+    flight.append(pd.DataFrame({"Id": ["A"], "Note": [np.nan], "unix_time": [1]}))
+    flight.append(pd.DataFrame({"Id": ["LONGER"], "Note": ["text"], "unix_time": [2]}))
+    frames = FrameDecoder()
+    for schema in flight.schemas(0, len(flight)):
+        frames.decode(schema.announcement())
+    rows = [frames.decode(bytes(message)).tolist()[0] for message in flight.batch(0, len(flight))]
+    assert rows[0][0] == "A" and np.isnan(rows[0][1])
+    assert rows[1] == ("LONGER", "text", 2.0)
+
+
+def test_read_flight_without_a_writable_cache(tmp_path):
+    # A cache that cannot be written must not stop the CSV being read
+    file_path = str(tmp_path / "flight.csv")
+    pd.DataFrame({"GPS Date & Time": pd.date_range("2024-01-01", periods=25, freq="s"),
+                  "Alt": range(25)}).to_csv(file_path, index=False)
+    open(cache_path(file_path), "w").close()
+    chunks = list(read_flight(file_path, chunksize=10, cache=True))
+    assert sum(len(chunk) for chunk in chunks) == 25
+
+
+class ListSocket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message, copy=True):
+        self.sent.append(bytes(message))
+
+
+class ListPublisher:
+    def __init__(self):
+        self.socket = ListSocket()
+
+
+def test_replay_returns_when_the_last_row_is_sent():
+    # 0.2 s of rows must not be reported as taking a whole report interval
+    flight = EncodedFlight.encode(pd.DataFrame({"Alt": range(21), "unix_time": np.linspace(0, 0.2, 21)}))
+    publisher = ListPublisher()
+    start = monotonic()
+    assert replay_flight(flight, publisher, speed=1.0, report_interval=5.0) == 21
+    assert monotonic() - start < 2.0
+    assert len(publisher.socket.sent) == 21
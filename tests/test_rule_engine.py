@@ -0,0 +1,78 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from rule_engine import AlertTracker, CompiledRules, HashRing, compile_rules
+
+
+def test_match_indices_equals_dense_evaluate():
+    rng = np.random.default_rng(4)
+    # Few distinct values so limits tie with each other and with the facts
+    limits = rng.integers(0, 10, size=(500, 3)).astype(float)
+    facts = rng.integers(0, 11, size=(2000, 3)).astype(float)
+    facts[rng.random(facts.shape) < 0.05] = np.nan
+    rules = CompiledRules([f"Rule {i}" for i in range(len(limits))], ["Altitude", "Speed", "Heading"], limits)
+    dense = rules.evaluate(facts)
+    for fact_index, counts in enumerate(rules.prefix_lengths(facts)):
+        assert rules.match_indices(counts).tolist() == np.flatnonzero(dense[fact_index]).tolist()
+
+
+def test_alert_tracker_enter_exit_and_realert():
+    tracker = AlertTracker(enter_count=2, exit_count=3, realert_interval=10.0)
+    # A single match is not enough, and a miss resets the count
+    assert tracker.update("AC1", ["High"], 0.0) == []
+    assert tracker.update("AC1", [], 1.0) == []
+    assert tracker.update("AC1", ["High"], 2.0) == []
+    assert tracker.update("AC1", ["High"], 3.0) == ["Alert: High matched on AC1."]
+    # Repeat matches are coalesced until the re-alert interval has passed
+    for now in range(4, 13):
+        assert tracker.update("AC1", ["High"], float(now)) == []
+    assert tracker.update("AC1", ["High"], 13.0) == ["Alert: High still active on AC1 (10 matches since last alert)."]
+    # Fewer than exit_count misses keep the alert active
+    assert tracker.update("AC1", [], 14.0) == []
+    assert tracker.update("AC1", [], 15.0) == []
+    assert tracker.update("AC1", ["High"], 16.0) == []
+    assert tracker.active_count() == 1
+    for now in (17.0, 18.0):
+        assert tracker.update("AC1", [], now) == []
+    assert tracker.update("AC1", [], 19.0) == ["Cleared: High on AC1."]
+    assert tracker.active_count() == 0
+    assert tracker.states == {}
+
+
+def test_compile_rules_reuses_unchanged_rows_on_reload(capsys):
+    data = pd.DataFrame({"Rule_Name": ["Low", "High"], "Altitude_Limit": [100, 5000], "Speed_Limit": [50, 200]})
+    first = compile_rules(data)
+    capsys.readouterr()
+    edited = pd.DataFrame({"Rule_Name": ["Low", "High", "Fast"],
+                           "Altitude_Limit": [100, 6000, 0], "Speed_Limit": [50, 200, 400]})
+    second = compile_rules(edited, previous=first)
+    output = capsys.readouterr().out
+    assert "Registering Low" not in output
+    assert "Registering High: Altitude > 6000, Speed > 200" in output
+    assert "Registering Fast" in output
+    assert "Rules reloaded: 2 new or changed, 1 unchanged, 1 removed" in output
+    assert second.names == ["Low", "High", "Fast"]
+    assert second.limits.tolist() == [[100, 50], [6000, 200], [0, 400]]
+    # The reused rules give the same matches as a fresh compile
+    facts = [[150, 60], [7000, 500], [10, 500]]
+    assert (second.evaluate(facts) == compile_rules(edited).evaluate(facts)).all()
+
+
+def test_hash_ring_is_stable_and_moves_few_aircraft_on_resize():
+    aircraft = [f"AC{i}/S/CRZ" for i in range(2000)]
+    ring = HashRing(4)
+    assigned = [ring.shard_for(key) for key in aircraft]
+    # The same key always lands on the same shard, also in a fresh ring
+    assert [ring.shard_for(key) for key in aircraft] == assigned
+    assert [HashRing(4).shard_for(key) for key in aircraft] == assigned
+    assert set(assigned) == {0, 1, 2, 3}
+    # A small cache starts over without changing any assignment
+    assert [HashRing(4, cache_size=10).shard_for(key) for key in aircraft] == assigned
+    # Adding a fifth shard only moves aircraft onto the new shard
+    resized = [HashRing(5).shard_for(key) for key in aircraft]
+    moved = [new for old, new in zip(assigned, resized) if old != new]
+    assert set(moved) == {4}
+    assert len(moved) < len(aircraft) / 3
@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from telemetry import FieldDecoder, TelemetrySchema
+
+
+def test_text_and_binary_resolve_the_same_fields():
+    # Field i of a text message is column f{i} of a binary frame, whatever
+    # the frame's column names
+    columns = [f"Column {i}" for i in range(18)]
+    schema = TelemetrySchema(columns, ["<U8"] * 4 + ["<f8"] * 14)
+    row = ["20240101", "AC1", "M", "P"] + [float(i) for i in range(4, 18)]
+    decoder = FieldDecoder(["identity", "latitude", "heading"])
+    decoder.frames.decode(schema.announcement())
+    text = "|".join(str(value) for value in row)
+    assert decoder.decode(text) == decoder.decode(schema.encode(schema.pack([row]))) == [("AC1", 4.0, 17.0)]
@@ -0,0 +1,21 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from timeseries import RingSeries
+
+
+def test_snapshot_since_across_the_wrap():
+    series = RingSeries(["a", "b"], capacity=8)
+    for t in range(13):
+        series.append(float(t), {"a": t, "b": -t})
+    # Samples 5..12 are held, wrapped around the end of the buffer
+    for since in [-1.0, 4.0, 5.0, 6.5, 7.0, 9.0, 12.0, 20.0]:
+        times, values = series.snapshot(["b"], since=since)
+        expected = [float(t) for t in range(5, 13) if t > since]
+        assert times.tolist() == expected
+        assert values["b"].tolist() == [-t for t in expected]
+    times, values = series.snapshot()
+    assert times.tolist() == [float(t) for t in range(5, 13)]
+    assert np.array_equal(values["a"], times)
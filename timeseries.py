@@ -0,0 +1,126 @@
+import threading
+import numpy as np
+
+
+class RingSeries:
+    """Fixed-capacity history of timestamped samples for a set of fields.
+
+    Samples are kept in preallocated NumPy arrays used as a ring buffer, so
+    memory is bounded by `capacity` however long the dashboard runs. Fields
+    missing from a sample, or not numeric, are stored as NaN.
+    """
+
+    def __init__(self, fields, capacity=144000):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self.times = np.full(capacity, np.nan)
+        self.values = np.full((capacity, len(self.fields)), np.nan)
+        self.count = 0
+        self.total = 0      # samples appended since start
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, sample):
+        """Append one sample given as a {field: value} mapping"""
+        row = [_number(sample.get(field)) for field in self.fields]
+        with self._lock:
+            self.times[self._next] = timestamp
+            self.values[self._next] = row
+            self._next = (self._next + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.total += 1
+
+    def snapshot(self, fields=None, since=None):
+        """Return (times, {field: values}) in time order, optionally only samples after `since`"""
+        fields = self.fields if fields is None else fields
+        columns = [self.fields.index(field) for field in fields]
+        with self._lock:
+            start = (self._next - self.count) % self.capacity
+            first = self._first_after(start, since) if since is not None else 0
+            # Only the requested samples and fields are copied out of the ring
+            order = (start + first + np.arange(self.count - first)) % self.capacity
+            times = self.times[order]
+            values = self.values[np.ix_(order, columns)]
+        return times, {field: values[:, j] for j, field in enumerate(fields)}
+
+    def _first_after(self, start, since):
+        # Index, counted from the oldest held sample, of the first sample
+        # after `since`. The held samples are at most two sorted runs of the
+        # buffer, before and after the wrap, each binary-searched in place.
+        head = min(self.count, self.capacity - start)
+        first = int(np.searchsorted(self.times[start:start + head], since, side='right'))
+        if first == head and head < self.count:
+            first += int(np.searchsorted(self.times[:self.count - head], since, side='right'))
+        return first
+
+    def tail(self, seen, fields=None):
+        """Return (times, {field: values}, total) for the samples appended after
+        the first `seen`, as many as are still held"""
+        fields = self.fields if fields is None else fields
+        with self._lock:
+            new = min(self.total - seen, self.count)
+            order = (self._next - new + np.arange(new)) % self.capacity
+            times = self.times[order]
+            columns = [self.fields.index(field) for field in fields]
+            values = self.values[np.ix_(order, columns)]
+            total = self.total
+        return times, {field: values[:, j] for j, field in enumerate(fields)}, total
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def minmax_indices(y, buckets):
+    """Indices of the minimum and maximum of `buckets` equal-count buckets,
+    plus the first and last sample, in index order"""
+    n = len(y)
+    if n <= 2 * buckets + 2:
+        return np.arange(n)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    # After sorting by (bucket, y) each bucket starts at its minimum and ends at its maximum
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends])))
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` samples that keep the visual shape"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket edges over the samples between the fixed first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    # Average point of every bucket, used as the third vertex of the triangle
+    # for the bucket before it
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    avg_x = np.append(avg_x[1:], x[n - 1])
+    avg_y = np.append(avg_y[1:], y[n - 1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(x, y, points, method="lttb"):
+    """Reduce a series to about `points` samples, dropping NaNs first"""
+    keep = np.isfinite(y)
+    x, y = x[keep], y[keep]
+    if method == "minmax":
+        indices = minmax_indices(y, max(points // 2 - 1, 1))
+    else:
+        indices = lttb_indices(x, y, points)
+    return x[indices], y[indices]